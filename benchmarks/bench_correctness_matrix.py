@@ -0,0 +1,95 @@
+"""So sánh chấm điểm từng câu bằng set với ma trận đúng/sai NumPy.
+
+Chạy: python benchmarks/bench_correctness_matrix.py --submissions 100000 --questions 200
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import Grader, CorrectnessMatrix, compile_answer_key, CORRECT, WRONG, SKIPPED
+from synthetic import make_questions, make_responses
+
+
+def make_responses_list(questions, n_submissions, rng):
+    """Bài làm dạng danh sách văn bản đáp án (như dữ liệu cũ), mức đúng khác nhau giữa các bài"""
+    return [make_responses(questions, rng.betavariate(4, 2), rng) for _ in range(n_submissions)]
+
+
+def set_based_stats(questions, responses_list):
+    """Cách làm cũ: mỗi thống kê duyệt lại toàn bộ bài nộp, so sánh frozenset đáp án đã chọn với đáp án đúng"""
+    keys = [compile_answer_key(q) for q in questions]
+
+    scores = []
+    for responses in responses_list:
+        total = 0
+        for key in keys:
+            user_answers = responses.get(key.question_id)
+            if user_answers is not None and frozenset(user_answers) == key.correct:
+                total += key.score
+        scores.append(total)
+
+    counts = {key.question_id: {CORRECT: 0, WRONG: 0, SKIPPED: 0} for key in keys}
+    for responses in responses_list:
+        for key in keys:
+            user_answers = responses.get(key.question_id)
+            if not user_answers:
+                counts[key.question_id][SKIPPED] += 1
+            elif frozenset(user_answers) == key.correct:
+                counts[key.question_id][CORRECT] += 1
+            else:
+                counts[key.question_id][WRONG] += 1
+
+    correct_counts = [
+        sum(1 for key in keys if frozenset(responses.get(key.question_id, [])) == key.correct)
+        for responses in responses_list
+    ]
+    return scores, counts, correct_counts
+
+
+def matrix_stats(questions, responses_list):
+    """Một lượt mã hóa, các thống kê là phép rút gọn trên ma trận"""
+    matrix = CorrectnessMatrix(Grader(questions), responses_list)
+    matrix.scores()
+    matrix.question_counts()
+    matrix.correct_counts()
+    return matrix
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    questions = make_questions(args.questions, rng)
+    responses_list = make_responses_list(questions, args.submissions, rng)
+    print(f"{args.submissions} bài nộp x {args.questions} câu hỏi")
+
+    set_seconds, (scores, counts, correct_counts) = timed(set_based_stats, questions, responses_list)
+    matrix_seconds, matrix = timed(matrix_stats, questions, responses_list)
+    # Hai cách chấm phải cho cùng kết quả
+    assert matrix.scores().tolist() == scores
+    assert matrix.question_counts() == counts
+    assert matrix.correct_counts().tolist() == correct_counts
+    reduce_seconds, _ = timed(lambda: (matrix.scores(), matrix.question_counts(), matrix.correct_counts()))
+
+    print(f"So sánh set (chấm + đếm + số câu đúng): {set_seconds:.2f}s")
+    print(f"Ma trận NumPy (mã hóa + rút gọn):      {matrix_seconds:.2f}s  (x{set_seconds / matrix_seconds:.1f})")
+    print(f"  Chỉ các phép rút gọn trên ma trận:    {reduce_seconds:.3f}s")
+    print(f"  Bộ nhớ ma trận mặt nạ: {matrix.selections.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""So sánh xuất bảng DOCX qua python-docx từng ô với bộ ghi XML hàng loạt.
+
+Chạy: python benchmarks/bench_docx_export.py --rows 2000 --questions 50
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import resource
+import multiprocessing
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+
+from modules.docx_writer import write_dataframe_docx
+
+
+def make_frame(n_rows, n_questions, rng):
+    """DataFrame cùng dạng báo cáo tất cả bài nộp: 8 cột thông tin + 2 cột mỗi câu hỏi"""
+    data = {
+        "ID": range(1, n_rows + 1),
+        "Email": [f"hv{rng.randint(1, n_rows // 3 + 1)}@example.com" for _ in range(n_rows)],
+        "Họ và tên": [f"Học viên {i}" for i in range(n_rows)],
+        "Lớp": [f"Lớp {rng.randint(1, 20)}" for _ in range(n_rows)],
+        "Thời gian nộp": [datetime.fromtimestamp(1.7e9 + rng.randint(0, 10 ** 7)).strftime("%d/%m/%Y %H:%M:%S")
+                          for _ in range(n_rows)],
+        "Điểm số": [rng.randint(0, n_questions) for _ in range(n_rows)],
+        "Điểm tối đa": n_questions,
+    }
+    data["Tỷ lệ đúng"] = [f"{score / n_questions * 100:.1f}%" for score in data["Điểm số"]]
+    for q_id in range(1, n_questions + 1):
+        data[f"Câu {q_id}: Câu hỏi {q_id}"] = [f"Đáp án {q_id}.{rng.randint(1, 4)}" for _ in range(n_rows)]
+        data[f"Câu {q_id} - Đúng/Sai"] = [rng.choice(["Đúng", "Sai"]) for _ in range(n_rows)]
+    return pd.DataFrame(data)
+
+
+def legacy_dataframe_to_docx(df, title):
+    """Cách làm cũ: thêm từng hàng, đặt kiểu từng ô qua python-docx, lưu vào BytesIO"""
+    doc = Document()
+    style = doc.styles['Normal']
+    style.font.name = 'Times New Roman'
+    style.font.size = Pt(12)
+    doc.add_heading(title, level=1).alignment = WD_ALIGN_PARAGRAPH.CENTER
+    table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
+    header_cells = table.rows[0].cells
+    for i, col_name in enumerate(df.columns):
+        header_cells[i].text = str(col_name)
+        for paragraph in header_cells[i].paragraphs:
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            paragraph.runs[0].bold = True
+    for _, row in df.iterrows():
+        row_cells = table.add_row().cells
+        for i, value in enumerate(row):
+            row_cells[i].text = str(value)
+            for paragraph in row_cells[i].paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getbuffer().nbytes
+
+
+def bulk_dataframe_to_docx(df, title):
+    """Bộ ghi mới: XML hàng loạt, ghi thẳng ra file tạm"""
+    with tempfile.TemporaryFile() as output:
+        write_dataframe_docx(df, title, output)
+        return output.tell()
+
+
+def _run(fn, args, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((seconds, (after - before) * 1024, result))
+
+
+def measure(fn, *args):
+    """Chạy trong tiến trình con: thời gian và phần RSS tăng thêm (gồm cả bộ nhớ của lxml)"""
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run, args=(fn, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-legacy", action="store_true", help="Chỉ chạy bộ ghi mới (bảng rất lớn)")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.questions, random.Random(args.seed))
+    print(f"{len(df)} hàng x {len(df.columns)} cột")
+
+    bulk_seconds, bulk_peak, bulk_size = measure(bulk_dataframe_to_docx, df, "Báo cáo tất cả bài nộp")
+    print(f"Bộ ghi XML hàng loạt: {bulk_seconds:.2f}s, RSS tăng {bulk_peak / 1e6:.1f} MB, file {bulk_size / 1e6:.1f} MB")
+
+    if not args.skip_legacy:
+        legacy_seconds, legacy_peak, legacy_size = measure(legacy_dataframe_to_docx, df, "Báo cáo tất cả bài nộp")
+        print(f"python-docx từng ô:   {legacy_seconds:.2f}s, RSS tăng {legacy_peak / 1e6:.1f} MB, file {legacy_size / 1e6:.1f} MB")
+        print(f"Nhanh hơn x{legacy_seconds / bulk_seconds:.1f}, bộ nhớ ít hơn x{legacy_peak / max(bulk_peak, 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Đo thời gian và bộ nhớ các đường xử lý chính trên dữ liệu giả lập, lưu kết quả JSON.
+
+Mỗi phép đo chạy trong một tiến trình con trên database SQLite tạm: lưu bài nộp,
+đọc lịch sử nộp bài, tải và chuẩn bị dữ liệu trang thống kê, xuất các báo cáo.
+
+Chạy: python benchmarks/run_benchmarks.py --preset full --output benchmarks/results/full.json
+      python benchmarks/run_benchmarks.py --preset small --compare benchmarks/results/small.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import resource
+import subprocess
+import multiprocessing
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+
+import database_helper
+from storage import SQLiteBackend
+from report_cli import build_frames, SHEET_NAMES
+from modules.report_data import ReportDataset, build_submissions_frame
+from modules.report_export import (
+    dataframe_to_docx, export_to_excel, export_to_csv, create_student_report_docx, student_report_tasks,
+    write_student_reports_zip, display_frame
+)
+from synthetic import generate, load_sqlite, make_responses
+
+# Quy mô dữ liệu: (học viên, câu hỏi, bài nộp)
+PRESETS = {
+    "small": (1000, 50, 10000),
+    "medium": (5000, 200, 50000),
+    "full": (10000, 500, 100000),
+}
+
+
+def _load_dataset():
+    return ReportDataset.from_bundle(database_helper.fetch_report_bundle())
+
+
+def bench_save_submission(ctx):
+    rng = random.Random(ctx["seed"])
+    questions = database_helper.get_all_questions()
+    for i in range(ctx["save_count"]):
+        user = ctx["users"][i % len(ctx["users"])]
+        database_helper.save_submission(user["email"], make_responses(questions, 0.7, rng))
+    return ctx["save_count"]
+
+
+def bench_get_user_submissions(ctx):
+    for email in ctx["busiest_users"]:
+        database_helper.get_user_submissions(email)
+    return len(ctx["busiest_users"])
+
+
+def bench_submission_summary(ctx):
+    for email in ctx["busiest_users"]:
+        database_helper.get_submission_summary(email)
+    return len(ctx["busiest_users"])
+
+
+def bench_get_all_submissions(ctx):
+    database_helper.get_user_submissions()
+    return 1
+
+
+def bench_load_report_dataset(ctx):
+    _load_dataset()
+    return 1
+
+
+def bench_report_prep(ctx):
+    build_frames(ctx["dataset"])
+    return 1
+
+
+def _frame_mb(df):
+    return round(int(df.memory_usage(deep=True).sum()) / 1e6, 1)
+
+
+def bench_submissions_frame(ctx):
+    df = build_submissions_frame(ctx["dataset"])
+    return 1, {"frame_mb": _frame_mb(df)}
+
+
+def bench_submissions_frame_text(ctx):
+    # Cùng bảng nhưng mọi ô đã là chuỗi hiển thị (bố cục cũ), để so sánh bộ nhớ
+    df = display_frame(build_submissions_frame(ctx["dataset"])).astype(object)
+    return 1, {"frame_mb": _frame_mb(df)}
+
+
+def bench_export_docx(ctx):
+    dataframe_to_docx(ctx["frames"][0], "Báo cáo tất cả bài nộp", os.path.join(ctx["output_dir"], "all.docx"))
+    return 1
+
+
+def bench_export_csv(ctx):
+    export_to_csv(ctx["frames"][0], os.path.join(ctx["output_dir"], "all.csv"))
+    return 1
+
+
+def bench_export_excel(ctx):
+    export_to_excel(ctx["frames"], SHEET_NAMES, os.path.join(ctx["output_dir"], "all.xlsx"))
+    return 1
+
+
+def bench_student_report(ctx):
+    tasks = ctx["student_tasks"]
+    for _, kwargs in tasks:
+        create_student_report_docx(**kwargs)
+    return len(tasks)
+
+
+def bench_student_reports_zip(ctx):
+    tasks = ctx["student_tasks"]
+    write_student_reports_zip(tasks, os.path.join(ctx["output_dir"], "students.zip"), workers=ctx["workers"])
+    return len(tasks)
+
+
+# (tên, hàm đo, dữ liệu cần chuẩn bị trước khi đo); save_submission ghi vào database nên chạy cuối
+BENCHMARKS = [
+    ("get_user_submissions", bench_get_user_submissions, None),
+    ("submission_summary", bench_submission_summary, None),
+    ("get_all_submissions", bench_get_all_submissions, None),
+    ("load_report_dataset", bench_load_report_dataset, None),
+    ("report_prep", bench_report_prep, "dataset"),
+    ("submissions_frame", bench_submissions_frame, "dataset"),
+    ("submissions_frame_text", bench_submissions_frame_text, "dataset"),
+    ("export_docx", bench_export_docx, "frames"),
+    ("export_csv", bench_export_csv, "frames"),
+    ("export_excel", bench_export_excel, "frames"),
+    ("student_report", bench_student_report, "student_tasks"),
+    ("student_reports_zip", bench_student_reports_zip, "student_tasks"),
+    ("save_submission", bench_save_submission, None),
+]
+
+
+def _prepare(ctx, need):
+    """Dữ liệu đầu vào của phép đo, dựng ở tiến trình cha và không tính vào kết quả"""
+    if need in ("dataset", "frames", "student_tasks") and "dataset" not in ctx:
+        ctx["dataset"] = _load_dataset()
+    if need == "frames" and "frames" not in ctx:
+        ctx["frames"] = build_frames(ctx["dataset"])
+    if need == "student_tasks" and "student_tasks" not in ctx:
+        ctx["student_tasks"] = student_report_tasks(ctx["dataset"])[:ctx["report_students"]]
+
+
+def _run(fn, ctx, queue):
+    # Kết nối SQLite không dùng chung qua fork: tiến trình con mở kết nối riêng
+    database_helper.set_backend(SQLiteBackend(ctx["db_path"]))
+    database_helper.get_grader()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    ops = fn(ctx)
+    seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ops, metrics = ops if isinstance(ops, tuple) else (ops, {})
+    queue.put((seconds, (after - before) * 1024, ops, metrics))
+
+
+def measure(fn, ctx):
+    """Chạy trong tiến trình con: thời gian, phần RSS tăng thêm, số thao tác đã làm và số đo riêng
+
+    Hàm đo trả về số thao tác, hoặc (số thao tác, dict số đo riêng như frame_mb).
+    """
+    mp = multiprocessing.get_context("fork")
+    queue = mp.Queue()
+    process = mp.Process(target=_run, args=(fn, ctx, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    """In tỷ lệ thời gian và bộ nhớ so với một file kết quả trước đó"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nSo với {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        time_ratio = result["seconds"] / max(old["seconds"], 1e-9)
+        memory_ratio = result["rss_growth_mb"] / max(old["rss_growth_mb"], 0.1)
+        flag = "  <-- chậm hơn" if time_ratio > 1.2 else ""
+        frame = f", bảng x{result['frame_mb'] / max(old['frame_mb'], 0.1):.2f}" if "frame_mb" in result and "frame_mb" in old else ""
+        print(f"  {name:<22} thời gian x{time_ratio:.2f}, bộ nhớ x{memory_ratio:.2f}{frame}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=list(PRESETS), default="small")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--questions", type=int)
+    parser.add_argument("--submissions", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy-responses", action="store_true", help="Câu trả lời dạng văn bản đáp án như dữ liệu cũ")
+    parser.add_argument("--only", nargs="+", choices=[name for name, _, _ in BENCHMARKS], help="Chỉ chạy các phép đo này")
+    parser.add_argument("--save-count", type=int, default=200, help="Số bài nộp ghi trong phép đo save_submission")
+    parser.add_argument("--report-students", type=int, default=200, help="Số học viên trong phép đo báo cáo từng học viên")
+    parser.add_argument("--workers", type=int, default=database_helper.get_setting("REPORT_WORKERS", os.cpu_count() or 1))
+    parser.add_argument("--output", help="File JSON lưu kết quả (mặc định benchmarks/results/<preset>-<thời gian>.json)")
+    parser.add_argument("--compare", help="File JSON kết quả trước đó để so sánh")
+    args = parser.parse_args()
+
+    n_users, n_questions, n_submissions = PRESETS[args.preset]
+    n_users = args.users or n_users
+    n_questions = args.questions or n_questions
+    n_submissions = args.submissions or n_submissions
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        started = time.perf_counter()
+        data = generate(n_users, n_questions, n_submissions, seed=args.seed, legacy_responses=args.legacy_responses)
+        db_path = os.path.join(work_dir, "bench.db")
+        load_sqlite(data, db_path)
+        print(f"{n_users} học viên, {n_questions} câu hỏi, {n_submissions} bài nộp "
+              f"(sinh và nạp dữ liệu {time.perf_counter() - started:.1f}s)")
+
+        database_helper.set_backend(SQLiteBackend(db_path))
+        counts = {}
+        for s in data.submissions:
+            counts[s["user_email"]] = counts.get(s["user_email"], 0) + 1
+        ctx = {
+            "db_path": db_path,
+            "output_dir": work_dir,
+            "seed": args.seed,
+            "users": data.users,
+            "busiest_users": sorted(counts, key=counts.get, reverse=True)[:50],
+            "save_count": args.save_count,
+            "report_students": args.report_students,
+            "workers": int(args.workers),
+        }
+        del data
+
+        results = {}
+        for name, fn, need in BENCHMARKS:
+            if args.only and name not in args.only:
+                continue
+            _prepare(ctx, need)
+            seconds, rss_growth, ops, metrics = measure(fn, ctx)
+            results[name] = {"seconds": round(seconds, 4), "ops": ops, "ms_per_op": round(seconds / max(ops, 1) * 1000, 3),
+                             "rss_growth_mb": round(rss_growth / 1e6, 1), **metrics}
+            extra = "".join(f"  {key} {value}" for key, value in metrics.items())
+            print(f"  {name:<22} {seconds:8.3f}s  {results[name]['ms_per_op']:10.3f} ms/lần  "
+                  f"RSS tăng {results[name]['rss_growth_mb']:7.1f} MB{extra}")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {"preset": args.preset, "users": n_users, "questions": n_questions, "submissions": n_submissions,
+                   "seed": args.seed, "legacy_responses": args.legacy_responses, "save_count": args.save_count, "report_students": args.report_students,
+                   "workers": ctx["workers"]},
+        "results": results,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, "results",
+                                         f"{args.preset}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Đã lưu kết quả vào {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Sinh dữ liệu giả lập (có seed) cho benchmark: học viên, lớp, câu hỏi và bài nộp.
+
+Dữ liệu có cùng dạng với kết quả của database_helper (get_all_users,
+get_all_questions, get_user_submissions) và có thể nạp vào một database SQLite.
+
+Chạy: python benchmarks/synthetic.py --db data/synthetic.db --users 10000 --questions 500 --submissions 100000
+"""
+import os
+import sys
+import json
+import random
+import argparse
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import Grader
+from storage import SQLiteBackend
+
+SyntheticData = namedtuple("SyntheticData", ["users", "questions", "submissions"])
+
+# Học kỳ giả lập: học viên đăng ký trong tháng đầu, nộp bài trong cả học kỳ
+TERM_START = datetime(2024, 9, 1)
+TERM_DAYS = 120
+REGISTRATION_DAYS = 30
+
+_WORDS = ["hệ thống", "dữ liệu", "khảo sát", "đánh giá", "quy trình", "an toàn", "thông tin", "mạng",
+          "bảo mật", "phần mềm", "người dùng", "chính sách", "quản lý", "kiểm tra", "báo cáo", "ứng dụng"]
+
+
+def _phrase(rng, min_words, max_words):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def make_classes(n_classes):
+    return [f"{10 + i // 26 % 3}A{i % 26 + 1}" if i < 78 else f"Lớp {i + 1}" for i in range(n_classes)]
+
+
+def make_users(n_users, classes, rng):
+    """Học viên dạng get_all_users (kèm mật khẩu để nạp database), sĩ số các lớp không đều"""
+    weights = [rng.uniform(0.5, 1.5) for _ in classes]
+    users = []
+    for i in range(1, n_users + 1):
+        registered = TERM_START + timedelta(seconds=rng.randint(0, REGISTRATION_DAYS * 86400))
+        users.append({
+            "email": f"hv{i:06d}@example.com",
+            "password": f"matkhau{i}",
+            "role": "Học viên",
+            "full_name": f"Học viên {_phrase(rng, 1, 2).title()} {i}",
+            "class": rng.choices(classes, weights)[0],
+            "registration_date": registered.isoformat(),
+        })
+    return users
+
+
+def make_questions(n_questions, rng):
+    """Câu hỏi dạng get_all_questions: xen kẽ Checkbox (1-2 đáp án đúng) và Combobox"""
+    questions = []
+    for q_id in range(1, n_questions + 1):
+        answers = [f"Đáp án {q_id}.{i}: {_phrase(rng, 2, 8)}" for i in range(1, rng.randint(3, 6) + 1)]
+        if q_id % 2:
+            correct = sorted(rng.sample(range(1, len(answers) + 1), rng.randint(1, 2)))
+            q_type = "Checkbox"
+        else:
+            correct = [rng.randint(1, len(answers))]
+            q_type = "Combobox"
+        questions.append({"id": q_id, "question": f"Câu hỏi {q_id}: {_phrase(rng, 5, 15)}?", "type": q_type,
+                          "answers": answers, "correct": correct, "score": rng.randint(1, 3)})
+    return questions
+
+
+def make_responses(questions, ability, rng):
+    """Bài làm của một học viên: trả lời đúng với xác suất ability, bỏ qua khoảng 5% câu"""
+    responses = {}
+    for q in questions:
+        if rng.random() < 0.05:
+            continue
+        if rng.random() < ability:
+            answers = [q["answers"][i - 1] for i in q["correct"]]
+        else:
+            k = rng.randint(1, 2) if q["type"] == "Checkbox" else 1
+            answers = rng.sample(q["answers"], k)
+        responses[str(q["id"])] = answers
+    return responses
+
+
+def make_submissions(users, questions, n_submissions, rng, grader=None, legacy_responses=False):
+    """Bài nộp dạng get_user_submissions (mới nhất trước), số lần nộp mỗi học viên lệch nhau
+
+    Câu trả lời được mã hóa bằng mặt nạ bit như save_submission, hoặc giữ dạng
+    danh sách văn bản đáp án của dữ liệu cũ nếu legacy_responses.
+    """
+    grader = grader or Grader(questions)
+    abilities = {u["email"]: rng.betavariate(4, 2) for u in users}
+    registered = {u["email"]: datetime.fromisoformat(u["registration_date"]) for u in users}
+    # Một số học viên nộp nhiều lần, đa số chỉ một vài lần
+    weights = [rng.paretovariate(1.5) for _ in users]
+    term_end = TERM_START + timedelta(days=TERM_DAYS)
+    submissions = []
+    for user in rng.choices(users, weights, k=n_submissions):
+        email = user["email"]
+        start = registered[email]
+        submitted = start + timedelta(seconds=rng.randint(0, int((term_end - start).total_seconds())))
+        responses = make_responses(questions, abilities[email], rng)
+        score, results = grader.grade_results(responses)
+        if not legacy_responses:
+            responses = grader.encode_responses(responses)
+        submissions.append({"user_email": email, "timestamp": int(submitted.timestamp()), "responses": responses,
+                            "score": score, "results": results, "grader_version": grader.fingerprint})
+    submissions.sort(key=lambda s: s["timestamp"])
+    for submission_id, submission in enumerate(submissions, 1):
+        submission["id"] = submission_id
+    submissions.reverse()
+    return submissions
+
+
+def generate(n_users, n_questions, n_submissions, n_classes=None, seed=42, legacy_responses=False):
+    """Bộ dữ liệu giả lập hoàn chỉnh, cùng seed cho cùng kết quả"""
+    rng = random.Random(seed)
+    classes = make_classes(n_classes or max(1, n_users // 35))
+    users = make_users(n_users, classes, rng)
+    questions = make_questions(n_questions, rng)
+    submissions = make_submissions(users, questions, n_submissions, rng, legacy_responses=legacy_responses)
+    return SyntheticData(users, questions, submissions)
+
+
+def load_sqlite(data, db_path):
+    """Nạp dữ liệu giả lập vào database SQLite mới (xóa file cũ), trả về engine lưu trữ"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    backend = SQLiteBackend(db_path)
+    conn = backend._connect()
+    with conn:
+        conn.execute('INSERT INTO users (email, password, role, first_login, full_name) VALUES (?, ?, ?, ?, ?)',
+                     ("admin@example.com", "password123", "Admin", 0, "Quản trị viên"))
+        conn.executemany(
+            'INSERT INTO users (email, password, role, first_login, full_name, class, registration_date) '
+            'VALUES (?, ?, ?, 0, ?, ?, ?)',
+            [(u["email"], u["password"], u["role"], u["full_name"], u["class"], u["registration_date"])
+             for u in data.users]
+        )
+        conn.executemany(
+            'INSERT INTO questions (id, question, type, answers, correct, score) VALUES (?, ?, ?, ?, ?, ?)',
+            [(q["id"], q["question"], q["type"], json.dumps(q["answers"]), json.dumps(q["correct"]), q["score"])
+             for q in data.questions]
+        )
+        conn.executemany(
+            'INSERT INTO submissions (id, user_email, timestamp, responses, score, results, grader_version) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(s["id"], s["user_email"], float(s["timestamp"]), json.dumps(s["responses"], separators=(",", ":")), s["score"], s["results"],
+              s["grader_version"]) for s in reversed(data.submissions)]
+        )
+    return backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="File SQLite cần tạo (dùng với STORAGE_BACKEND=sqlite)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--submissions", type=int, default=10000)
+    parser.add_argument("--classes", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy-responses", action="store_true", help="Lưu câu trả lời dạng văn bản đáp án như dữ liệu cũ")
+    args = parser.parse_args()
+
+    data = generate(args.users, args.questions, args.submissions, args.classes, args.seed, args.legacy_responses)
+    load_sqlite(data, args.db)
+    print(f"Đã tạo {args.db}: {len(data.users)} học viên, {len(data.questions)} câu hỏi, "
+          f"{len(data.submissions)} bài nộp (tài khoản admin@example.com / password123)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 import os
 import json
 import time
+import hashlib
+import threading
 import streamlit as st
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from supabase import create_client, Client
+import numpy as np
+import pandas as pd
+import httpx
+from supabase import create_client, Client, ClientOptions
 from dotenv import load_dotenv
+from storage import SupabaseBackend, SQLiteBackend, RequestGate, TABLE_COLUMNS, projection
+from grading import Grader
 
 # Tải biến môi trường từ file .env (chỉ cho môi trường phát triển)
 try:
@@ -12,57 +21,146 @@ try:
 except:
     pass
 
-# Ưu tiên lấy từ Streamlit secrets, nếu không có thì lấy từ biến môi trường
-try:
-    supabase_url = st.secrets["SUPABASE_URL"]
-    supabase_key = st.secrets["SUPABASE_KEY"]
-    print(f"Loaded Supabase credentials from Streamlit secrets")
-except Exception as e:
-    # Fallback to environment variables
-    supabase_url = os.environ.get("SUPABASE_URL")
-    supabase_key = os.environ.get("SUPABASE_KEY")
-    print(f"Loaded Supabase credentials from environment variables: {e}")
-
-# Kiểm tra xem đã có thông tin kết nối chưa
-if not supabase_url or not supabase_key:
-    print("WARNING: Missing Supabase credentials. Make sure to set SUPABASE_URL and SUPABASE_KEY.")
-
-# Kết nối đến Supabase
-try:
-    supabase: Client = create_client(supabase_url, supabase_key)
-    print("Successfully connected to Supabase")
+def get_setting(name, default=None):
+    """Đọc cấu hình, ưu tiên Streamlit secrets rồi đến biến môi trường"""
+    try:
+        return st.secrets[name]
+    except Exception:
+        return os.environ.get(name, default)
+
+# Chọn engine lưu trữ: "supabase" (mặc định) hoặc "sqlite" (chạy cục bộ trên một máy chủ)
+STORAGE_BACKEND = str(get_setting("STORAGE_BACKEND", "supabase")).lower()
+SQLITE_DB_PATH = get_setting("SQLITE_DB_PATH", "data/survey.db")
+
+# Cấu hình kết nối HTTP tới Supabase, dùng chung cho mọi phiên trong tiến trình
+SUPABASE_POOL_SIZE = int(get_setting("SUPABASE_POOL_SIZE", 20))
+SUPABASE_KEEPALIVE_SECONDS = float(get_setting("SUPABASE_KEEPALIVE_SECONDS", 60))
+SUPABASE_TIMEOUT = float(get_setting("SUPABASE_TIMEOUT", 10))
+SUPABASE_MAX_IN_FLIGHT = int(get_setting("SUPABASE_MAX_IN_FLIGHT", SUPABASE_POOL_SIZE))
+SUPABASE_QUEUE_TIMEOUT = float(get_setting("SUPABASE_QUEUE_TIMEOUT", SUPABASE_TIMEOUT))
+
+# Thời gian sống (giây) của cache ngân hàng câu hỏi; giới hạn độ trễ khi câu hỏi
+# được sửa từ một tiến trình khác
+QUESTION_CACHE_TTL = float(get_setting("QUESTION_CACHE_TTL", 60))
+
+# Số bài nộp đọc mỗi trang khi duyệt bảng submissions (PostgREST mặc định giới hạn 1000 dòng)
+SUBMISSION_PAGE_SIZE = int(get_setting("SUBMISSION_PAGE_SIZE", 1000))
+
+# Tự chạy bước khởi tạo database (kiểm tra bảng, tạo admin mặc định) khi kết nối lần đầu.
+# Mặc định tắt để khởi động không tốn truy vấn nào; chạy riêng bằng
+# `python database_helper.py bootstrap`
+AUTO_BOOTSTRAP = str(get_setting("AUTO_BOOTSTRAP", "false")).lower() in ("1", "true", "yes")
+
+def _connect_supabase():
+    """Tạo Supabase client từ secrets/biến môi trường"""
+    # Ưu tiên lấy từ Streamlit secrets, nếu không có thì lấy từ biến môi trường
+    try:
+        supabase_url = st.secrets["SUPABASE_URL"]
+        supabase_key = st.secrets["SUPABASE_KEY"]
+        print(f"Loaded Supabase credentials from Streamlit secrets")
+    except Exception as e:
+        # Fallback to environment variables
+        supabase_url = os.environ.get("SUPABASE_URL")
+        supabase_key = os.environ.get("SUPABASE_KEY")
+        print(f"Loaded Supabase credentials from environment variables: {e}")
+
+    # Kiểm tra xem đã có thông tin kết nối chưa
+    if not supabase_url or not supabase_key:
+        print("WARNING: Missing Supabase credentials. Make sure to set SUPABASE_URL and SUPABASE_KEY.")
+
+    # Kết nối đến Supabase qua một pool kết nối HTTP (keep-alive) có giới hạn
+    try:
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_SIZE,
+                max_keepalive_connections=SUPABASE_POOL_SIZE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_SECONDS
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT)
+        )
+        options = ClientOptions(httpx_client=http_client, postgrest_client_timeout=SUPABASE_TIMEOUT)
+        client: Client = create_client(supabase_url, supabase_key, options=options)
+        print(f"Successfully created Supabase client (pool size {SUPABASE_POOL_SIZE})")
+    except Exception as e:
+        print(f"Error connecting to Supabase: {e}")
+        # Để tránh crash ứng dụng khi chưa cấu hình, tạo mock object cho testing
+        class MockSupabase:
+            def table(self, name):
+                return self
+            def select(self, *args, **kwargs):
+                return self
+            def insert(self, data):
+                return self
+            def update(self, data):
+                return self
+            def eq(self, *args):
+                return self
+            def order(self, *args, **kwargs):
+                return self
+            def execute(self):
+                return type('obj', (object,), {'data': [], 'count': 0})
+            
+        client = MockSupabase()
+    return client
+
+# Engine lưu trữ được tạo lười ở lần dùng đầu tiên, một lần cho mỗi tiến trình
+_backend = None
+_backend_lock = threading.Lock()
+_init_stats = {"backend": None, "init_seconds": None, "bootstrap_seconds": None}
+
+def get_backend():
+    """Lấy engine lưu trữ, khởi tạo ở lần gọi đầu tiên (không gửi truy vấn nào)"""
+    global _backend
+    if _backend is not None:
+        return _backend
     
-    # Kiểm tra xem đã có bảng users chưa
-    resp = supabase.table('users').select('count', count='exact').execute()
-    total_users = resp.count if hasattr(resp, 'count') else 0
-    print(f"Found {total_users} users in database")
+    created = False
+    with _backend_lock:
+        if _backend is None:
+            started = time.perf_counter()
+            if STORAGE_BACKEND == "sqlite":
+                new_backend = SQLiteBackend(SQLITE_DB_PATH)
+                print(f"Using local SQLite storage at {SQLITE_DB_PATH}")
+            else:
+                gate = RequestGate(SUPABASE_MAX_IN_FLIGHT, queue_timeout=SUPABASE_QUEUE_TIMEOUT)
+                new_backend = SupabaseBackend(_connect_supabase(), gate=gate)
+            _init_stats["backend"] = new_backend.name
+            _init_stats["init_seconds"] = time.perf_counter() - started
+            _backend = new_backend
+            created = True
     
-except Exception as e:
-    print(f"Error connecting to Supabase: {e}")
-    # Để tránh crash ứng dụng khi chưa cấu hình, tạo mock object cho testing
-    class MockSupabase:
-        def table(self, name):
-            return self
-        def select(self, *args, **kwargs):
-            return self
-        def insert(self, data):
-            return self
-        def update(self, data):
-            return self
-        def eq(self, *args):
-            return self
-        def order(self, *args, **kwargs):
-            return self
-        def execute(self):
-            return type('obj', (object,), {'data': [], 'count': 0})
-        
-    supabase = MockSupabase()
+    if created and AUTO_BOOTSTRAP:
+        bootstrap_database()
+    return _backend
+
+def set_backend(new_backend):
+    """Dùng một engine lưu trữ cho trước (cho CLI, benchmark)"""
+    global _backend
+    with _backend_lock:
+        _backend = new_backend
+        _init_stats["backend"] = new_backend.name
+    invalidate_question_cache()
+
+def get_client_stats():
+    """Số liệu của client dùng chung: số truy vấn lấy lượt ngay, phải chờ, hết giờ..."""
+    gate = getattr(get_backend(), "gate", None)
+    stats = gate.stats() if gate else {}
+    stats["backend"] = get_backend().name
+    if stats["backend"] == "supabase":
+        stats["pool_size"] = SUPABASE_POOL_SIZE
+        stats["keepalive_seconds"] = SUPABASE_KEEPALIVE_SECONDS
+        stats["timeout_seconds"] = SUPABASE_TIMEOUT
+    return stats
+
+def get_init_stats():
+    """Thời gian khởi tạo engine và bootstrap (giây) của tiến trình hiện tại"""
+    return dict(_init_stats)
 
 def ensure_tables_exist():
     """Đảm bảo các bảng cần thiết đã tồn tại"""
     try:
-        # Tạo bảng users nếu chưa tồn tại
-        supabase.table('users').select('count', count='exact').limit(1).execute()
+        # Tạo bảng users nếu chưa tồn tại (SQLite tự tạo bảng, Supabase chỉ kiểm tra)
+        get_backend().ensure_schema()
         print("Users table exists")
     except Exception as e:
         print(f"Error checking users table: {e}")
@@ -73,38 +171,44 @@ def ensure_tables_exist():
         except:
             pass
 
+    try:
+        # Supabase: báo các cột results/grader_version chưa được thêm (bài nộp vẫn lưu được, không kèm kết quả)
+        get_backend().missing_submission_columns()
+    except Exception as e:
+        print(f"Error checking submissions table: {e}")
+
 def add_default_user_if_not_exists():
     """Thêm tài khoản admin mặc định nếu chưa có"""
     try:
         # Kiểm tra xem có admin nào không
-        response = supabase.table('users').select('*').eq('role', 'Admin').execute()
-        print(f"Found {len(response.data)} admin users")
+        admins = get_backend().find_users(role='Admin')
+        print(f"Found {len(admins)} admin users")
         
-        if len(response.data) == 0:
+        if len(admins) == 0:
             print("No admin found, creating default admin user")
             # Thêm admin mặc định
-            result = supabase.table('users').insert({
+            result = get_backend().insert_user({
                 'email': 'admin@example.com',
                 'password': 'password123',
                 'role': 'Admin',
                 'first_login': True,
                 'full_name': 'Quản trị viên'
-            }).execute()
-            print(f"Default admin created: {result.data}")
+            })
+            print(f"Default admin created: {result}")
         else:
-            print(f"Admin already exists: {response.data[0]['email']}")
+            print(f"Admin already exists: {admins[0]['email']}")
     except Exception as e:
         print(f"Error adding default user: {e}")
         # Thử lại một lần nữa với cách khác
         try:
             print("Trying alternative method to create admin...")
-            supabase.table('users').upsert({
+            get_backend().upsert_user({
                 'email': 'admin@example.com',
                 'password': 'password123',
                 'role': 'Admin',
                 'first_login': True,
                 'full_name': 'Quản trị viên'
-            }).execute()
+            })
             print("Admin created using upsert")
         except Exception as e2:
             print(f"Failed to create admin with upsert: {e2}")
@@ -113,12 +217,12 @@ def register_user(email, password, full_name, class_name):
     """Đăng ký người dùng mới với vai trò 'Học viên'"""
     try:
         # Kiểm tra xem email đã tồn tại chưa
-        response = supabase.table('users').select('*').eq('email', email).execute()
-        if len(response.data) > 0:
+        existing = get_backend().find_users(email=email)
+        if len(existing) > 0:
             return False, "Email này đã được đăng ký"
         
         # Thêm người dùng mới
-        supabase.table('users').insert({
+        get_backend().insert_user({
             'email': email,
             'password': password,
             'role': 'Học viên',
@@ -126,37 +230,61 @@ def register_user(email, password, full_name, class_name):
             'full_name': full_name,
             'class': class_name,
             'registration_date': datetime.now().isoformat()
-        }).execute()
+        })
+        _forget_failed_logins(email)
         
         return True, "Đăng ký thành công"
     except Exception as e:
         print(f"Error registering user: {e}")
         return False, f"Lỗi khi đăng ký: {str(e)}"
 
+# Các cột cần cho phiên đăng nhập (app.py lưu vào session state)
+LOGIN_COLUMNS = ["email", "role", "first_login", "full_name", "class"]
+
+# Cache âm cho các lần đăng nhập sai trong tiến trình, tránh dồn truy vấn khi bị thử lại liên tục
+LOGIN_NEGATIVE_CACHE_TTL = float(get_setting("LOGIN_NEGATIVE_CACHE_TTL", 30))
+LOGIN_NEGATIVE_CACHE_SIZE = 10000
+_failed_logins = OrderedDict()
+_failed_logins_lock = threading.Lock()
+
+def _login_key(email, password):
+    return (email, hashlib.sha256(password.encode("utf-8")).hexdigest())
+
+def _is_recent_failed_login(key):
+    with _failed_logins_lock:
+        expires_at = _failed_logins.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.time():
+            del _failed_logins[key]
+            return False
+        return True
+
+def _remember_failed_login(key):
+    with _failed_logins_lock:
+        _failed_logins[key] = time.time() + LOGIN_NEGATIVE_CACHE_TTL
+        _failed_logins.move_to_end(key)
+        while len(_failed_logins) > LOGIN_NEGATIVE_CACHE_SIZE:
+            _failed_logins.popitem(last=False)
+
+def _forget_failed_logins(email):
+    """Xóa cache đăng nhập sai của một email (sau khi đăng ký hoặc đổi mật khẩu)"""
+    with _failed_logins_lock:
+        for key in [k for k in _failed_logins if k[0] == email]:
+            del _failed_logins[key]
+
 def get_user(email, password):
     """Kiểm tra đăng nhập và trả về thông tin người dùng"""
+    key = _login_key(email, password)
+    if _is_recent_failed_login(key):
+        return None
+    
     try:
-        # Print debug info to Streamlit log
-        st.write(f"DEBUG: Attempting login for: {email} with password: {password}")
-        print(f"DEBUG: Attempting login for: {email} with password: {password}")
-        
-        # First check if any users exist
-        all_users = supabase.table('users').select('*').execute()
-        st.write(f"DEBUG: Total users in database: {len(all_users.data)}")
-        print(f"DEBUG: Total users in database: {len(all_users.data)}")
-        for u in all_users.data:
-            st.write(f"DEBUG: Found user: {u['email']} with role {u['role']}")
-            print(f"DEBUG: Found user: {u['email']} with role {u['role']}")
-        
-        # Now try to log in
-        response = supabase.table('users').select('*').eq('email', email).eq('password', password).execute()
-        st.write(f"DEBUG: Login query returned {len(response.data)} results")
-        print(f"DEBUG: Login query returned {len(response.data)} results")
+        # Một truy vấn duy nhất theo email (có chỉ mục), chỉ lấy các cột cần thiết
+        matches = get_backend().find_users(email=email, password=password, columns=LOGIN_COLUMNS, limit=1)
         
-        if response.data:
-            user = response.data[0]
-            st.write(f"DEBUG: User found: {user['email']} with role {user['role']}")
-            print(f"DEBUG: User found: {user['email']} with role {user['role']}")
+        if matches:
+            user = matches[0]
             return {
                 "email": user["email"],
                 "role": user["role"],
@@ -164,29 +292,23 @@ def get_user(email, password):
                 "full_name": user.get("full_name", ""),
                 "class": user.get("class", "")
             }
-        else:
-            # Just check if user exists
-            user_check = supabase.table('users').select('*').eq('email', email).execute()
-            if user_check.data:
-                st.write(f"DEBUG: User exists but password is wrong. Should be: {user_check.data[0]['password']}")
-                print(f"DEBUG: User exists but password is wrong. Should be: {user_check.data[0]['password']}")
-            else:
-                st.write(f"DEBUG: No user found with email: {email}")
-                print(f"DEBUG: No user found with email: {email}")
-            return None
+        
+        print(f"Login failed for: {email}")
+        _remember_failed_login(key)
+        return None
     except Exception as e:
-        st.write(f"DEBUG ERROR: {type(e).__name__}: {str(e)}")
-        print(f"DEBUG ERROR: {type(e).__name__}: {str(e)}")
+        print(f"Error getting user: {type(e).__name__}: {str(e)}")
         return None
 
 def update_password(email, new_password):
     """Cập nhật mật khẩu và đánh dấu đã đổi mật khẩu"""
     try:
         print(f"Updating password for {email}")
-        supabase.table('users').update({
+        get_backend().update_user(email, {
             'password': new_password,
             'first_login': False
-        }).eq('email', email).execute()
+        })
+        _forget_failed_logins(email)
         print("Password updated successfully")
         return True
     except Exception as e:
@@ -196,13 +318,10 @@ def update_password(email, new_password):
 def get_all_users(role=None):
     """Lấy danh sách tất cả người dùng, có thể lọc theo vai trò"""
     try:
-        if role:
-            response = supabase.table('users').select('*').eq('role', role).execute()
-        else:
-            response = supabase.table('users').select('*').execute()
+        rows = get_backend().find_users(role=role)
         
         users = []
-        for user in response.data:
+        for user in rows:
             users.append({
                 "email": user["email"],
                 "role": user["role"],
@@ -215,28 +334,92 @@ def get_all_users(role=None):
         print(f"Error getting users: {e}")
         return []
 
+# Cache ngân hàng câu hỏi dùng chung cho cả tiến trình, gắn với một phiên bản
+# được tăng mỗi khi câu hỏi bị thêm/sửa/xóa
+_question_cache_lock = threading.Lock()
+_question_bank_version = 0
+_question_cache = {"version": None, "loaded_at": 0.0, "questions": None, "grader": None}
+
+def get_question_bank_version():
+    """Phiên bản hiện tại của ngân hàng câu hỏi trong tiến trình này"""
+    return _question_bank_version
+
+def invalidate_question_cache():
+    """Tăng phiên bản ngân hàng câu hỏi để bỏ cache cũ"""
+    global _question_bank_version
+    with _question_cache_lock:
+        _question_bank_version += 1
+        _question_cache["questions"] = None
+        _question_cache["grader"] = None
+
 def save_question(question_data):
     """Lưu câu hỏi vào database"""
     try:
-        supabase.table('questions').insert({
+        get_backend().insert_question({
             'question': question_data["question"],
             'type': question_data["type"],
             'answers': json.dumps(question_data["answers"]),
             'correct': json.dumps(question_data["correct"]),
             'score': question_data["score"]
-        }).execute()
+        })
         return True
     except Exception as e:
         print(f"Error saving question: {e}")
         return False
+    finally:
+        invalidate_question_cache()
+
+def get_all_questions(force_refresh=False):
+    """Lấy tất cả câu hỏi (đọc qua cache, tải lại khi hết hạn hoặc đổi phiên bản)
 
-def get_all_questions():
-    """Lấy tất cả câu hỏi từ database"""
+    Danh sách trả về dùng chung giữa các phiên, chỉ nên đọc.
+    """
+    with _question_cache_lock:
+        version = _question_bank_version
+        cached = _question_cache["questions"]
+        fresh = time.time() - _question_cache["loaded_at"] < QUESTION_CACHE_TTL
+        if not force_refresh and cached is not None and _question_cache["version"] == version and fresh:
+            return list(cached)
+    
+    questions = _load_questions()
+    if questions is None:
+        return []
+    
+    with _question_cache_lock:
+        # Chỉ lưu cache nếu không có thay đổi nào xảy ra trong lúc tải
+        if _question_bank_version == version:
+            _question_cache["version"] = version
+            _question_cache["loaded_at"] = time.time()
+            _question_cache["questions"] = questions
+            _question_cache["grader"] = None
+    return list(questions)
+
+def get_grader():
+    """Lấy bộ chấm điểm đã biên dịch cho ngân hàng câu hỏi hiện tại (dựng một lần mỗi phiên bản)"""
+    get_all_questions()
+    with _question_cache_lock:
+        source = _question_cache["questions"]
+        grader = _question_cache["grader"]
+        version = _question_cache["version"]
+    
+    if source is None:
+        # Cache vừa bị làm mới hoặc tải lỗi, dựng tạm từ dữ liệu hiện có
+        return Grader(get_all_questions(), version=_question_bank_version)
+    
+    if grader is None:
+        grader = Grader(source, version=version)
+        with _question_cache_lock:
+            if _question_cache["questions"] is source:
+                _question_cache["grader"] = grader
+    return grader
+
+def _load_questions():
+    """Tải và giải mã toàn bộ bảng câu hỏi, trả về None nếu lỗi"""
     try:
-        response = supabase.table('questions').select('*').execute()
+        rows = get_backend().find_questions()
         
         questions = []
-        for item in response.data:
+        for item in rows:
             questions.append({
                 "id": item["id"],
                 "question": item["question"],
@@ -248,34 +431,37 @@ def get_all_questions():
         return questions
     except Exception as e:
         print(f"Error getting questions: {e}")
-        return []
+        return None
+
+def save_submission(user_email, responses, max_attempts=None):
+    """Lưu một lần nộp bài của người dùng
 
-def save_submission(user_email, responses):
-    """Lưu một lần nộp bài của người dùng"""
+    Với max_attempts, bài nộp chỉ được thêm nếu học viên chưa nộp đủ số lần này
+    (kiểm tra và thêm trong cùng một giao dịch). Trả về None nếu không lưu được.
+    """
     try:
-        # Tính điểm
-        questions = get_all_questions()
-        total_score = 0
+        # Tính điểm và kết quả từng câu (lưu kèm phiên bản bộ đáp án để không phải chấm lại khi đọc)
+        grader = get_grader()
+        total_score, results = grader.grade_results(responses)
         
-        for q in questions:
-            q_id = q["id"]
-            if str(q_id) in responses:
-                user_ans = responses[str(q_id)]
-                expected = [q["answers"][i - 1] for i in q["correct"]]
-                
-                if set(user_ans) == set(expected):
-                    total_score += q["score"]
-        
-        # Lưu kết quả
-        result = supabase.table('submissions').insert({
+        # Lưu kết quả (mỗi câu là mặt nạ bit các đáp án đã chọn, xem Grader.encode_responses),
+        # kèm phiên bản danh sách đáp án dùng để mã hóa
+        register_option_layout(grader)
+        rows = get_backend().insert_submission({
             'user_email': user_email,
-            'responses': json.dumps(responses),
+            'responses': encode_responses_json(grader, responses),
             'score': total_score,
+            'results': results,
+            'grader_version': grader.fingerprint,
+            'options_version': grader.layout_fingerprint,
             'timestamp': datetime.now().isoformat()
-        }).execute()
+        }, max_attempts=max_attempts)
+        if not rows:
+            print(f"Submission limit reached for {user_email}")
+            return None
         
-        submission_id = result.data[0]["id"]
-        submission_time = result.data[0]["timestamp"]
+        submission_id = rows[0]["id"]
+        submission_time = rows[0]["timestamp"]
         
         return {
             "id": submission_id,
@@ -286,70 +472,443 @@ def save_submission(user_email, responses):
         print(f"Error saving submission: {e}")
         return None
 
+def encode_responses_json(grader, responses):
+    """Chuỗi JSON gọn của bài làm đã mã hóa bằng mặt nạ bit, dùng để lưu vào cột responses"""
+    return json.dumps(grader.encode_responses(responses), separators=(",", ":"))
+
+def _decode_submission(item, decode_responses=True):
+    """Giải mã một dòng submissions (chỉ các cột có trong dòng)"""
+    submission = {}
+    for column, value in item.items():
+        if column == "timestamp":
+            value = int(datetime.fromisoformat(value).timestamp())
+        elif column == "responses" and decode_responses and isinstance(value, str):
+            value = json.loads(value)
+        submission[column] = value
+    return submission
+
+def _decode_submissions(rows):
+    """Giải mã cả trang submissions; cột responses (JSON) của mọi dòng được giải mã bằng một lần json.loads
+
+    Câu trả lời mã hóa theo danh sách đáp án cũ (options_version) được đưa về danh sách hiện tại.
+    """
+    submissions = [_decode_submission(item, decode_responses=False) for item in rows]
+    encoded = [s for s in submissions if isinstance(s.get("responses"), str)]
+    if encoded:
+        decoded = json.loads("[" + ",".join(s["responses"] for s in encoded) + "]")
+        for submission, responses in zip(encoded, decoded):
+            submission["responses"] = responses
+    versioned = [s for s in submissions if s.get("options_version") and isinstance(s.get("responses"), dict)]
+    if versioned:
+        grader = get_grader()
+        changes = _layout_changes(grader, [s["options_version"] for s in versioned])
+        for submission in versioned:
+            if submission["options_version"] in changes:
+                submission["responses"] = grader.remap_responses(submission["responses"],
+                                                                 changes[submission["options_version"]])
+    return submissions
+
+# Danh sách đáp án theo phiên bản (options_version của bài nộp); một phiên bản không bao giờ đổi
+_option_layouts = {}
+_unknown_layouts = set()
+_option_layouts_lock = threading.Lock()
+
+def register_option_layout(grader):
+    """Lưu danh sách đáp án của bộ chấm (một lần mỗi phiên bản) để bài nộp mã hóa theo nó luôn giải mã được"""
+    version = grader.layout_fingerprint
+    with _option_layouts_lock:
+        if version in _option_layouts:
+            return True
+    try:
+        get_backend().insert_option_layout(version, json.dumps(grader.answers, ensure_ascii=False))
+    except Exception as e:
+        print(f"Error saving option layout: {e}")
+        return False
+    with _option_layouts_lock:
+        _option_layouts[version] = grader.answers
+    return True
+
+def get_option_layout(version):
+    """Danh sách đáp án (ID câu hỏi -> đáp án) của một phiên bản, None nếu không có"""
+    with _option_layouts_lock:
+        if version in _option_layouts:
+            return _option_layouts[version]
+    try:
+        answers = get_backend().find_option_layout(version)
+    except Exception as e:
+        print(f"Error getting option layout: {e}")
+        return None
+    if answers is None:
+        return None
+    layout = json.loads(answers) if isinstance(answers, str) else answers
+    with _option_layouts_lock:
+        _option_layouts[version] = layout
+    return layout
+
+def _layout_changes(grader, versions):
+    """Thay đổi danh sách đáp án (Grader.layout_changes) của từng phiên bản khác phiên bản hiện tại"""
+    changes = {}
+    for version in set(versions):
+        if not isinstance(version, str) or version == grader.layout_fingerprint:
+            continue
+        layout = get_option_layout(version)
+        if layout is None:
+            if version not in _unknown_layouts:
+                _unknown_layouts.add(version)
+                print(f"Unknown option layout {version}, decoding with the current answers")
+            continue
+        version_changes = grader.layout_changes(layout)
+        if version_changes:
+            changes[version] = version_changes
+    return changes
+
+def _with_options_version(columns):
+    """Đọc kèm options_version khi đọc responses (để giải mã theo đúng danh sách đáp án)"""
+    if columns and "responses" in columns and "options_version" not in columns:
+        return list(columns) + ["options_version"]
+    return columns
+
+def _to_datetime(value):
+    """Chuyển mốc thời gian (datetime, date hoặc epoch) thành datetime"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    return datetime(value.year, value.month, value.day)
+
+def iter_submission_pages(after=None, user_email=None, class_name=None, start=None, end=None, columns=None, page_size=None,
+                          decode=True):
+    """Duyệt bảng submissions theo từng trang (timestamp, id) tăng dần, bắt đầu sau con trỏ after
+
+    Mỗi lần trả về (danh sách bài nộp đã giải mã, con trỏ của dòng cuối). Con trỏ
+    có thể lưu lại làm mốc để lần sau chỉ đọc các bài nộp mới hơn. decode=False
+    trả về các dòng nguyên dạng engine lưu trữ trả về (để giải mã theo cột).
+    Lỗi truy vấn được ném ra cho nơi gọi.
+    """
+    page_size = page_size or SUBMISSION_PAGE_SIZE
+    start = _to_datetime(start)
+    end = _to_datetime(end)
+    columns = _with_options_version(columns)
+    
+    user_emails = [user_email] if user_email else None
+    
+    cursor = after
+    while True:
+        rows, cursor = get_backend().find_submissions_page(after=cursor, limit=page_size, user_emails=user_emails,
+                                                           class_name=class_name or None, start=start, end=end,
+                                                           columns=columns)
+        # Dừng ở trang rỗng: Supabase có thể trả ít dòng hơn page_size (giới hạn max-rows của server)
+        if not rows:
+            break
+        yield _decode_submissions(rows) if decode else rows, cursor
+
+def iter_submissions(user_email=None, class_name=None, start=None, end=None, columns=None, page_size=None):
+    """Duyệt các lần nộp bài theo thứ tự (timestamp, id) tăng dần, tải từng trang một
+
+    Có thể lọc theo học viên, lớp và khoảng thời gian [start, end), và chỉ lấy
+    một số cột (id và timestamp luôn có). Lỗi truy vấn được ném ra cho nơi gọi.
+    """
+    for page, _ in iter_submission_pages(user_email=user_email, class_name=class_name, start=start, end=end,
+                                         columns=columns, page_size=page_size):
+        yield from page
+
+def _epoch_seconds(values):
+    """Chuyển cả cột thời gian ISO thành epoch int64 (giây), như datetime.fromisoformat(v).timestamp()
+
+    Chuỗi không có múi giờ được hiểu là giờ địa phương; độ lệch múi giờ chỉ tính
+    một lần cho mỗi giờ khác nhau trong cột.
+    """
+    values = pd.Series(values, dtype=object).astype(str)
+    epoch = np.zeros(len(values), dtype=np.int64)
+    if not len(values):
+        return epoch
+    aware = values.str.contains(r"(?:Z|[+-]\d\d:?\d\d)$", regex=True).to_numpy()
+    if aware.any():
+        parsed = pd.to_datetime(values[aware], format="ISO8601", utc=True)
+        epoch[aware] = (parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    if not aware.all():
+        wall = pd.to_datetime(values[~aware], format="ISO8601")
+        wall = ((wall - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+        hours, inverse = np.unique(wall // 3600, return_inverse=True)
+        offsets = np.array([int(h) * 3600 - int(time.mktime(time.gmtime(int(h) * 3600)[:8] + (-1,)))
+                            for h in hours], dtype=np.int64)
+        epoch[~aware] = wall - offsets[inverse]
+    return epoch
+
+def _decode_json_column(values):
+    """Giải mã cả cột JSON bằng một lần json.loads (giá trị không phải chuỗi giữ nguyên)"""
+    values = list(values)
+    encoded = [i for i, value in enumerate(values) if isinstance(value, str)]
+    if encoded:
+        decoded = json.loads("[" + ",".join(values[i] for i in encoded) + "]")
+        for i, value in zip(encoded, decoded):
+            values[i] = value
+    return values
+
+def load_submissions_frame(user_email=None, class_name=None, start=None, end=None, columns=None, page_size=None):
+    """Tải bài nộp thành DataFrame theo cột, mới nhất trước
+
+    Chỉ đọc các cột được yêu cầu (id và timestamp luôn có). Kiểu các cột: id, score
+    là int64; timestamp là epoch int64 (giây); user_email, grader_version là
+    category; responses là dict đã giải mã (cả cột một lần).
+    Lỗi truy vấn được ném ra cho nơi gọi.
+    """
+    selected = projection("submissions", _with_options_version(columns), required=("id", "timestamp"))
+    selected = selected or list(TABLE_COLUMNS["submissions"])
+    rows = []
+    for page, _ in iter_submission_pages(user_email=user_email, class_name=class_name, start=start, end=end,
+                                         columns=selected, page_size=page_size, decode=False):
+        rows.extend(page)
+    return _submissions_frame(rows, selected)
+
+def _submissions_frame(rows, columns):
+    """DataFrame có kiểu từ các dòng submissions nguyên dạng (thứ tự tăng dần), trả về mới nhất trước"""
+    selected = projection("submissions", columns, required=("id", "timestamp"))
+    frame = pd.DataFrame.from_records(rows, columns=selected)
+    frame["id"] = frame["id"].astype(np.int64)
+    frame["timestamp"] = _epoch_seconds(frame["timestamp"])
+    if "score" in frame:
+        frame["score"] = frame["score"].fillna(0).astype(np.int64)
+    if "responses" in frame:
+        responses = _decode_json_column(frame["responses"])
+        if "options_version" in frame:
+            # Câu trả lời mã hóa theo danh sách đáp án cũ: đưa về danh sách hiện tại
+            versions = frame["options_version"].tolist()
+            grader = get_grader()
+            changes = _layout_changes(grader, versions)
+            if changes:
+                for i, version in enumerate(versions):
+                    if version in changes and isinstance(responses[i], dict):
+                        responses[i] = grader.remap_responses(responses[i], changes[version])
+            frame["options_version"] = frame["options_version"].astype("category")
+        frame["responses"] = pd.Series(responses, index=frame.index, dtype=object)
+    if "results" in frame:
+        frame["results"] = frame["results"].astype(object).where(frame["results"].notna(), None)
+    if "grader_version" in frame:
+        frame["grader_version"] = frame["grader_version"].astype("category")
+    if "user_email" in frame:
+        frame["user_email"] = frame["user_email"].astype("category")
+    return frame.iloc[::-1].reset_index(drop=True)
+
 def get_user_submissions(user_email=None):
-    """Lấy tất cả các lần nộp bài, có thể lọc theo email"""
+    """Lấy tất cả các lần nộp bài (mới nhất trước), có thể lọc theo email"""
     try:
         if user_email:
-            response = supabase.table('submissions').select('*').eq('user_email', user_email).order('timestamp', desc=True).execute()
-        else:
-            response = supabase.table('submissions').select('*').order('timestamp', desc=True).execute()
+            rows = get_backend().find_submissions(user_email)
+            return _decode_submissions(rows)
         
-        submissions = []
-        for item in response.data:
-            submissions.append({
-                "id": item["id"],
-                "user_email": item["user_email"],
-                "timestamp": int(datetime.fromisoformat(item["timestamp"]).timestamp()),
-                "responses": json.loads(item["responses"]) if isinstance(item["responses"], str) else item["responses"],
-                "score": item["score"]
-            })
+        # Đọc theo trang để không bị giới hạn số dòng của PostgREST
+        submissions = list(iter_submissions())
+        submissions.reverse()
         return submissions
     except Exception as e:
         print(f"Error getting submissions: {e}")
         return []
 
+def get_submission_summary(user_email):
+    """Số lần nộp (count), điểm cao nhất (best_score) và thời gian nộp gần nhất (last_timestamp, epoch)
+    của một học viên, không tải bài làm; best_score/last_timestamp là None nếu chưa nộp.
+    Trả về None nếu không đọc được (không coi là chưa nộp bài)."""
+    try:
+        row = get_backend().submission_summary(user_email)
+        last_timestamp = row.get("last_timestamp")
+        return {
+            "count": int(row.get("count") or 0),
+            "best_score": row.get("best_score"),
+            "last_timestamp": int(datetime.fromisoformat(last_timestamp).timestamp()) if last_timestamp else None,
+        }
+    except Exception as e:
+        print(f"Error getting submission summary: {e}")
+        return None
+
+def regrade_submissions(page_size=None):
+    """Lưu vector kết quả theo bộ đáp án hiện tại cho các bài nộp chưa có hoặc được chấm bằng bộ đáp án cũ
+
+    Điểm số đã lưu (điểm tại thời điểm nộp) được giữ nguyên. Trả về số bài nộp đã cập nhật.
+    """
+    grader = get_grader()
+    updated = 0
+    try:
+        if get_backend().missing_submission_columns():
+            print("Cannot store results: submissions table is missing the results/grader_version columns")
+            return 0
+        for page, _ in iter_submission_pages(columns=["responses", "results", "grader_version"], page_size=page_size):
+            for submission in page:
+                if grader.stored_results(submission) is not None:
+                    continue
+                _, results = grader.grade_results(submission["responses"])
+                get_backend().update_submission(submission["id"], {
+                    'results': results,
+                    'grader_version': grader.fingerprint
+                })
+                updated += 1
+    except Exception as e:
+        print(f"Error regrading submissions: {e}")
+    return updated
+
+def migrate_response_encoding(page_size=None):
+    """Ghi lại cột responses của các bài nộp theo dạng mặt nạ bit và danh sách đáp án hiện tại
+
+    Chuyển câu trả lời dạng cũ (danh sách văn bản đáp án) sang mặt nạ bit và mã hóa
+    lại các bài nộp lưu theo danh sách đáp án cũ (options_version khác hiện tại).
+    Chỉ ghi các dòng cần đổi, mỗi trang một lượt ghi; chạy lại sau khi bị dừng sẽ
+    tiếp tục các dòng còn lại. Trả về số bài nộp đã ghi lại.
+    """
+    grader = get_grader()
+    if not register_option_layout(grader):
+        return 0
+    track_version = "options_version" not in get_backend().missing_submission_columns()
+    migrated = 0
+    try:
+        for page, _ in iter_submission_pages(columns=["responses", "options_version"], page_size=page_size):
+            updates = []
+            for submission in page:
+                # responses đã được đưa về danh sách đáp án hiện tại khi đọc
+                encoded = grader.encode_responses(submission["responses"])
+                stale = track_version and submission.get("options_version") != grader.layout_fingerprint
+                if encoded == submission["responses"] and not stale:
+                    continue
+                updates.append({
+                    'id': submission["id"],
+                    'responses': json.dumps(encoded, separators=(",", ":")),
+                    'options_version': grader.layout_fingerprint
+                })
+            if updates:
+                get_backend().update_submission_responses(updates)
+                migrated += len(updates)
+    except Exception as e:
+        print(f"Error migrating responses: {e}")
+    return migrated
+
+def get_latest_submission_cursor():
+    """Con trỏ (timestamp, id) của bài nộp mới nhất, dùng làm phiên bản dữ liệu báo cáo"""
+    try:
+        return get_backend().latest_submission_cursor()
+    except Exception as e:
+        print(f"Error getting latest submission: {e}")
+        return None
+
+# Bộ dữ liệu cho trang thống kê, tải đồng thời
+ReportBundle = namedtuple("ReportBundle", ["grader", "questions", "submissions", "students", "fetched_at"])
+
+READ_WORKERS = int(get_setting("READ_WORKERS", 4))
+_read_executor = None
+_read_executor_lock = threading.Lock()
+
+def _get_read_executor():
+    """Thread pool dùng chung để gửi các truy vấn đọc độc lập song song"""
+    global _read_executor
+    with _read_executor_lock:
+        if _read_executor is None:
+            _read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="db-read")
+        return _read_executor
+
+def fetch_concurrently(**calls):
+    """Chạy song song các hàm đọc độc lập, trả về dict tên -> kết quả"""
+    executor = _get_read_executor()
+    futures = {name: executor.submit(fn) for name, fn in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+# Các cột bài nộp dùng cho trang thống kê (id và timestamp luôn có)
+REPORT_SUBMISSION_COLUMNS = ["user_email", "score", "responses", "results", "grader_version"]
+
+def _load_report_submissions(start=None):
+    try:
+        return load_submissions_frame(start=start, columns=REPORT_SUBMISSION_COLUMNS)
+    except Exception as e:
+        print(f"Error getting submissions: {e}")
+        # Chỉ đọc thêm (có start): báo lỗi bằng None để nơi gọi giữ nguyên dữ liệu cũ
+        return _submissions_frame([], REPORT_SUBMISSION_COLUMNS) if start is None else None
+
+def fetch_report_bundle(start=None):
+    """Tải câu hỏi, bài nộp (từ thời điểm start nếu có) và học viên cùng lúc; thời gian chờ bằng truy vấn chậm nhất"""
+    results = fetch_concurrently(
+        grader=get_grader,
+        submissions=lambda: _load_report_submissions(start),
+        students=lambda: get_all_users(role="Học viên")
+    )
+    grader = results["grader"]
+    return ReportBundle(grader, grader.questions, results["submissions"], results["students"], time.time())
+
 # Thêm các hàm này vào database_helper.py
 
 def update_question(question_id, updated_data):
-    """Cập nhật thông tin câu hỏi theo ID"""
+    """Cập nhật thông tin câu hỏi theo ID
+
+    Câu trả lời đã lưu tham chiếu vị trí đáp án và được giải mã theo danh sách đáp
+    án lúc lưu (options_version), nên không phải ghi lại khi đáp án đổi vị trí.
+    Trước khi đổi đáp án lần đầu, các bài nộp cũ chưa có options_version được gắn
+    phiên bản danh sách đáp án hiện tại.
+    """
     try:
-        # Giả định bạn đã có biến supabase client
-        result = supabase.table("questions").update(updated_data).eq("id", question_id).execute()
-        if result.data:
-            return True
-        return False
+        if "answers" in updated_data:
+            questions = _load_questions()
+            if questions is None:
+                return False
+            previous = Grader(questions)
+            if not register_option_layout(previous):
+                return False
+            get_backend().stamp_options_version(previous.layout_fingerprint)
+        rows = get_backend().update_question(question_id, updated_data)
+        return bool(rows)
     except Exception as e:
         print(f"Lỗi khi cập nhật câu hỏi: {e}")
         return False
+    finally:
+        invalidate_question_cache()
 
 def delete_question(question_id):
     """Xóa câu hỏi theo ID"""
     try:
-        # Giả định bạn đã có biến supabase client
-        result = supabase.table("questions").delete().eq("id", question_id).execute()
-        if result.data:
+        rows = get_backend().delete_question(question_id)
+        if rows:
             return True
         return False
     except Exception as e:
         print(f"Lỗi khi xóa câu hỏi: {e}")
         return False
+    finally:
+        invalidate_question_cache()
 
 def get_question_by_id(question_id):
     """Lấy thông tin câu hỏi theo ID"""
     try:
-        result = supabase.table("questions").select("*").eq("id", question_id).execute()
-        if result.data:
-            return result.data[0]
+        rows = get_backend().find_questions(question_id)
+        if rows:
+            return rows[0]
         return None
     except Exception as e:
         print(f"Lỗi khi lấy câu hỏi: {e}")
         return None
+
+def bootstrap_database():
+    """Khởi tạo database và thêm người dùng mặc định (bước quản trị, chạy riêng)"""
+    started = time.perf_counter()
+    try:
+        print("Initializing database...")
+        ensure_tables_exist()
+        print(f"Found {get_backend().count_users()} users in database")
+        add_default_user_if_not_exists()
+        print("Database initialization completed")
+    except Exception as e:
+        print(f"Error in initialization: {e}")
+    _init_stats["bootstrap_seconds"] = time.perf_counter() - started
+
+if __name__ == "__main__":
+    import argparse
     
-# Khởi tạo database và thêm người dùng mặc định
-try:
-    print("Initializing database...")
-    ensure_tables_exist()
-    add_default_user_if_not_exists()
-    print("Database initialization completed")
-except Exception as e:
-    print(f"Error in initialization: {e}")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Công cụ quản trị database của hệ thống khảo sát")
+    parser.add_argument("command", choices=["bootstrap", "regrade", "encode-responses"],
+                        help="bootstrap: kiểm tra bảng và tạo admin mặc định; "
+                             "regrade: lưu kết quả từng câu cho các bài nộp cũ theo bộ đáp án hiện tại; "
+                             "encode-responses: ghi lại câu trả lời của các bài nộp cũ dạng mặt nạ bit "
+                             "theo danh sách đáp án hiện tại")
+    args = parser.parse_args()
+    
+    if args.command == "bootstrap":
+        bootstrap_database()
+        print(f"Init stats: {get_init_stats()}")
+    elif args.command == "regrade":
+        print(f"Regraded {regrade_submissions()} submissions")
+    elif args.command == "encode-responses":
+        print(f"Re-encoded {migrate_response_encoding()} submissions")
\ No newline at end of file
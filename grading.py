@@ -0,0 +1,364 @@
+import json
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+# Đáp án đúng đã biên dịch của một câu hỏi
+AnswerKey = namedtuple("AnswerKey", ["question_id", "expected", "correct", "score"])
+
+# Kết quả chấm một câu hỏi: status là "correct", "wrong" hoặc "skipped"
+QuestionResult = namedtuple("QuestionResult", ["question", "user_answers", "expected", "is_correct", "status", "points"])
+
+CORRECT = "correct"
+WRONG = "wrong"
+SKIPPED = "skipped"
+
+# Vector kết quả lưu kèm bài nộp: mỗi câu hỏi một ký tự theo thứ tự Grader.question_ids,
+# điểm của câu đúng lấy từ bộ đáp án cùng phiên bản (grader_version)
+RESULT_CODES = {CORRECT: "c", WRONG: "w", SKIPPED: "s"}
+_RESULT_STATUSES = {code: status for status, code in RESULT_CODES.items()}
+
+# Mỗi đáp án của một câu hỏi ứng với một bit trong mặt nạ int64; bit cao nhất
+# đánh dấu đáp án không có trong danh sách (không bao giờ khớp đáp án đúng)
+MAX_OPTION_BITS = 62
+UNKNOWN_ANSWER_BIT = 1 << MAX_OPTION_BITS
+
+
+def option_index_map(old_answers, new_answers):
+    """Vị trí mới của từng đáp án cũ khi danh sách đáp án thay đổi, None nếu đáp án đã bị xóa
+
+    Đáp án được tìm theo nội dung. Khi số đáp án không đổi, đáp án cũ không còn
+    trong danh sách được coi là sửa chữ tại chỗ nếu vị trí đó mang nội dung mới.
+    """
+    if len(new_answers) > MAX_OPTION_BITS:
+        # Câu hỏi không mã hóa được bằng bit nữa: mọi câu trả lời chuyển về dạng văn bản
+        return [None] * len(old_answers)
+    positions = {}
+    for idx, answer in enumerate(new_answers):
+        positions.setdefault(answer, idx)
+    old_set = set(old_answers)
+    in_place = len(old_answers) == len(new_answers)
+    return [
+        positions[answer] if answer in positions
+        else idx if in_place and new_answers[idx] not in old_set else None
+        for idx, answer in enumerate(old_answers)
+    ]
+
+
+def remap_option_mask(mask, index_map, old_answers):
+    """Mặt nạ bit theo danh sách đáp án mới (xem option_index_map).
+
+    Nếu có đáp án đã chọn bị xóa, trả về danh sách văn bản đáp án cũ (dạng lưu của dữ liệu cũ).
+    """
+    remapped = 0
+    for idx, new_idx in enumerate(index_map):
+        if not mask >> idx & 1:
+            continue
+        if new_idx is None:
+            return [answer for i, answer in enumerate(old_answers) if mask >> i & 1]
+        remapped |= 1 << new_idx
+    return remapped
+
+
+def compile_answer_key(question):
+    """Biên dịch đáp án đúng của một câu hỏi thành frozenset các đáp án"""
+    expected = [question["answers"][i - 1] for i in question["correct"]]
+    return AnswerKey(str(question["id"]), expected, frozenset(expected), question["score"])
+
+
+class Grader:
+    """Bộ chấm điểm dựng một lần cho mỗi phiên bản ngân hàng câu hỏi.
+
+    Ánh xạ ID câu hỏi (dạng chuỗi, giống khóa của responses) sang đáp án đúng
+    và số điểm, dùng chung cho chấm một bài nộp hay cả loạt bài nộp.
+    """
+
+    def __init__(self, questions, version=None):
+        self.version = version
+        # Thứ tự câu hỏi cố định theo ID: vector kết quả lưu kèm bài nộp dựa vào thứ tự này,
+        # không phụ thuộc thứ tự dòng mà database trả về
+        self.questions = sorted(questions, key=lambda q: q["id"])
+        questions = self.questions
+        self.keys = {}
+        for q in questions:
+            key = compile_answer_key(q)
+            self.keys[key.question_id] = key
+        self.max_score = sum(key.score for key in self.keys.values())
+        self.fingerprint = self._fingerprint()
+        # Mã băm toàn bộ nội dung ngân hàng câu hỏi (cả nội dung câu hỏi và đáp án hiển thị)
+        self.content_fingerprint = hashlib.sha1(
+            json.dumps(self.questions, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()[:16]
+
+        # Mã hóa đáp án thành bit để chấm vector hóa (xem CorrectnessMatrix)
+        self.question_ids = list(self.keys)
+        self.answers = {str(q["id"]): q["answers"] for q in questions}
+        # Mã băm danh sách đáp án của mọi câu hỏi: mặt nạ bit đã lưu chỉ có nghĩa với đúng danh sách này
+        self.layout_fingerprint = hashlib.sha1(
+            json.dumps(self.answers, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        self.option_bits = {}
+        self._wide = set()
+        key_masks = []
+        for q in questions:
+            q_id = str(q["id"])
+            if len(q["answers"]) > MAX_OPTION_BITS:
+                # Quá nhiều đáp án để mã hóa bằng bit: cột này lưu sẵn kết quả đúng (1)/sai (2)
+                self._wide.add(q_id)
+                key_masks.append(1)
+                continue
+            bits = {}
+            for idx, answer in enumerate(q["answers"]):
+                bits.setdefault(answer, 1 << idx)
+            self.option_bits[q_id] = bits
+            key_masks.append(self.encode_answers(q_id, self.keys[q_id].expected))
+        self.key_masks = np.array(key_masks, dtype=np.int64)
+        self.key_mask_of = dict(zip(self.question_ids, key_masks))
+        self.points = np.array([self.keys[q_id].score for q_id in self.question_ids], dtype=np.int64)
+
+    def _fingerprint(self):
+        """Mã băm của bộ đáp án (ID câu hỏi theo đúng thứ tự chấm, đáp án đúng, điểm), ổn định giữa các tiến trình"""
+        payload = [[q_id, sorted(key.correct), key.score] for q_id, key in self.keys.items()]
+        return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    def encode_answers(self, question_id, user_answers):
+        """Mã hóa đáp án đã chọn của một câu hỏi thành mặt nạ bit (0 = không trả lời).
+
+        user_answers là danh sách đáp án hoặc mặt nạ bit đã lưu (giữ nguyên).
+        """
+        if type(user_answers) is int:
+            if question_id not in self._wide:
+                return user_answers
+            user_answers = self.decode_answers(question_id, user_answers)
+        if not user_answers:
+            return 0
+        if question_id in self._wide:
+            return 1 if frozenset(user_answers) == self.keys[question_id].correct else 2
+        bits = self.option_bits[question_id]
+        mask = 0
+        for answer in user_answers:
+            mask |= bits.get(answer, UNKNOWN_ANSWER_BIT)
+        return mask
+
+    def decode_answers(self, question_id, value):
+        """Danh sách đáp án đã chọn (văn bản) từ giá trị đã lưu: mặt nạ bit hoặc danh sách đáp án"""
+        if type(value) is not int:
+            return value or []
+        answers = self.answers.get(question_id, [])
+        return [answer for idx, answer in enumerate(answers) if value >> idx & 1]
+
+    def encode_responses(self, responses):
+        """Mã hóa bài làm để lưu: mỗi câu là mặt nạ bit các đáp án đã chọn, bỏ các câu không trả lời.
+
+        Câu hỏi không còn trong ngân hàng, có quá nhiều đáp án hoặc có đáp án
+        không nằm trong danh sách được giữ nguyên dạng danh sách đáp án.
+        """
+        encoded = {}
+        for q_id, value in responses.items():
+            if type(value) is int or q_id not in self.option_bits:
+                encoded[q_id] = value
+                continue
+            mask = self.encode_answers(q_id, value)
+            if mask & UNKNOWN_ANSWER_BIT:
+                encoded[q_id] = value
+            elif mask:
+                encoded[q_id] = mask
+        return encoded
+
+    def layout_changes(self, layout):
+        """Các câu hỏi có danh sách đáp án khác với layout (ID câu hỏi -> danh sách đáp án lúc mã hóa)
+
+        Trả về dict ID câu hỏi -> (option_index_map, danh sách cũ), dùng cho remap_responses.
+        """
+        changes = {}
+        for q_id, old_answers in layout.items():
+            answers = self.answers.get(q_id)
+            if answers is not None and answers != old_answers:
+                changes[q_id] = (option_index_map(old_answers, answers), old_answers)
+        return changes
+
+    def remap_responses(self, responses, changes):
+        """Bài làm mã hóa theo danh sách đáp án cũ chuyển sang danh sách hiện tại (changes từ layout_changes)
+
+        Câu trả lời có đáp án đã bị xóa trở về dạng danh sách văn bản đáp án.
+        """
+        remapped = dict(responses)
+        for q_id, value in responses.items():
+            change = changes.get(q_id)
+            if change is not None and type(value) is int:
+                remapped[q_id] = remap_option_mask(value, *change)
+        return remapped
+
+    def decode_responses(self, responses):
+        """Bài làm dạng danh sách đáp án (văn bản) của từng câu"""
+        return {q_id: self.decode_answers(q_id, value) for q_id, value in responses.items()}
+
+    def encode_matrix(self, responses_list):
+        """Mã hóa cả loạt bài nộp thành ma trận mặt nạ bit (bài nộp x câu hỏi)"""
+        encode = self.encode_answers
+        question_ids = self.question_ids
+        rows = [[encode(q_id, responses.get(q_id)) for q_id in question_ids] for responses in responses_list]
+        return np.array(rows, dtype=np.int64).reshape(len(rows), len(question_ids))
+
+    def _status(self, question_id, value):
+        """Trạng thái (đúng/sai/bỏ qua) của câu trả lời một câu hỏi, so sánh bằng mặt nạ bit"""
+        mask = self.encode_answers(question_id, value)
+        if not mask:
+            return SKIPPED
+        return CORRECT if mask == self.key_mask_of[question_id] else WRONG
+
+    def is_correct(self, question_id, user_answers):
+        """Kiểm tra câu trả lời của một câu hỏi"""
+        return self._status(str(question_id), user_answers) == CORRECT
+
+    def grade(self, responses):
+        """Tính tổng điểm của một bài nộp (dict ID câu hỏi -> đáp án đã chọn)"""
+        return self.grade_results(responses)[0]
+
+    def grade_many(self, responses_list):
+        """Tính điểm cho cả loạt bài nộp"""
+        return [self.grade(responses) for responses in responses_list]
+
+    def evaluate(self, responses):
+        """Chấm chi tiết từng câu hỏi của một bài nộp, theo thứ tự câu hỏi"""
+        results = []
+        for q in self.questions:
+            key = self.keys[str(q["id"])]
+            value = responses.get(key.question_id)
+            status = self._status(key.question_id, value)
+            is_correct = status == CORRECT
+            results.append(QuestionResult(q, self.decode_answers(key.question_id, value), key.expected, is_correct,
+                                          status, key.score if is_correct else 0))
+        return results
+
+    def tally(self, responses_list):
+        """Đếm số bài đúng/sai/bỏ qua cho từng câu hỏi trên cả loạt bài nộp"""
+        counts = {q_id: {CORRECT: 0, WRONG: 0, SKIPPED: 0} for q_id in self.keys}
+        for responses in responses_list:
+            for q_id in self.question_ids:
+                counts[q_id][self._status(q_id, responses.get(q_id))] += 1
+        return counts
+
+    def grade_results(self, responses):
+        """Chấm một bài nộp, trả về (tổng điểm, vector kết quả dạng chuỗi để lưu kèm bài nộp)"""
+        total = 0
+        codes = []
+        for q_id, key in self.keys.items():
+            status = self._status(q_id, responses.get(q_id))
+            codes.append(RESULT_CODES[status])
+            if status == CORRECT:
+                total += key.score
+        return total, "".join(codes)
+
+    def stored_results(self, submission):
+        """Vector kết quả đã lưu của bài nộp nếu được chấm bằng đúng bộ đáp án này, ngược lại None"""
+        return self.valid_results(submission.get("results"), submission.get("grader_version"))
+
+    def valid_results(self, results, grader_version):
+        """Vector kết quả nếu được chấm bằng đúng bộ đáp án này, ngược lại None"""
+        if results and grader_version == self.fingerprint and len(results) == len(self.question_ids):
+            return results
+        return None
+
+    def submission_results(self, submission):
+        """Kết quả từng câu của một bài nộp: đọc từ vector đã lưu, chỉ chấm lại khi bộ đáp án đã đổi"""
+        results = self.stored_results(submission)
+        if results is None:
+            return self.evaluate(submission["responses"])
+        responses = submission.get("responses") or {}
+        question_results = []
+        for q, code in zip(self.questions, results):
+            key = self.keys[str(q["id"])]
+            status = _RESULT_STATUSES[code]
+            is_correct = status == CORRECT
+            user_answers = self.decode_answers(key.question_id, responses.get(key.question_id))
+            question_results.append(QuestionResult(q, user_answers, key.expected, is_correct, status,
+                                                   key.score if is_correct else 0))
+        return question_results
+
+
+class CorrectnessMatrix:
+    """Ma trận đúng/sai (bài nộp x câu hỏi) dựng bằng một lượt chấm duy nhất.
+
+    Các số liệu thống kê (đúng/sai/bỏ qua theo câu hỏi, số câu đúng và điểm theo
+    bài nộp) đều là phép rút gọn NumPy trên ma trận này.
+    """
+
+    def __init__(self, grader, responses_list):
+        self.grader = grader
+        self.question_ids = grader.question_ids
+        self.column_of = {q_id: j for j, q_id in enumerate(self.question_ids)}
+        self.selections = grader.encode_matrix(responses_list)
+        self.answered = self.selections != 0
+        self.correct = (self.selections == grader.key_masks) & self.answered
+
+    @classmethod
+    def from_submissions(cls, grader, submissions):
+        """Dựng từ các bài nộp: dùng vector kết quả đã lưu nếu cùng bộ đáp án, chỉ chấm lại các bài còn lại"""
+        return cls.from_columns(grader, [s["responses"] for s in submissions],
+                                [s.get("results") for s in submissions], [s.get("grader_version") for s in submissions])
+
+    @classmethod
+    def from_columns(cls, grader, responses_list, results_list, versions_list):
+        """Như from_submissions, với các cột responses, results, grader_version tách riêng"""
+        matrix = cls.__new__(cls)
+        matrix.grader = grader
+        matrix.question_ids = grader.question_ids
+        matrix.column_of = {q_id: j for j, q_id in enumerate(matrix.question_ids)}
+        matrix.selections = None
+
+        stored = [grader.valid_results(results, version) for results, version in zip(results_list, versions_list)]
+        graded = [i for i, results in enumerate(stored) if results is not None]
+        codes = np.full((len(stored), len(grader.question_ids)), ord(RESULT_CODES[SKIPPED]), dtype=np.uint8)
+        if graded:
+            # Giải mã cả loạt vector kết quả một lần: mỗi ký tự ASCII là một ô của ma trận
+            packed = "".join(stored[i] for i in graded).encode("ascii")
+            codes[graded] = np.frombuffer(packed, dtype=np.uint8).reshape(len(graded), len(grader.question_ids))
+        matrix.answered = codes != ord(RESULT_CODES[SKIPPED])
+        matrix.correct = codes == ord(RESULT_CODES[CORRECT])
+
+        stale = [i for i, results in enumerate(stored) if results is None]
+        if stale:
+            selections = grader.encode_matrix([responses_list[i] for i in stale])
+            matrix.answered[stale] = selections != 0
+            matrix.correct[stale] = (selections == grader.key_masks) & (selections != 0)
+        return matrix
+
+    def stacked(self, other, order):
+        """Ma trận gồm các dòng của other rồi các dòng của ma trận này, sắp lại theo order (cùng Grader)"""
+        matrix = CorrectnessMatrix.__new__(CorrectnessMatrix)
+        matrix.grader = self.grader
+        matrix.question_ids = self.question_ids
+        matrix.column_of = self.column_of
+        matrix.selections = None
+        matrix.answered = np.concatenate([other.answered, self.answered])[order]
+        matrix.correct = np.concatenate([other.correct, self.correct])[order]
+        return matrix
+
+    def __len__(self):
+        return self.correct.shape[0]
+
+    def as_int8(self):
+        """Ma trận dạng int8: 1 = đúng, 0 = sai, -1 = bỏ qua"""
+        result = self.correct.astype(np.int8)
+        result[~self.answered] = -1
+        return result
+
+    def correct_counts(self):
+        """Số câu đúng của từng bài nộp"""
+        return self.correct.sum(axis=1)
+
+    def scores(self):
+        """Điểm của từng bài nộp theo đáp án hiện tại"""
+        return self.correct.astype(np.int64) @ self.grader.points
+
+    def question_counts(self):
+        """Số bài đúng/sai/bỏ qua của từng câu hỏi, dạng dict giống Grader.tally"""
+        correct = self.correct.sum(axis=0)
+        answered = self.answered.sum(axis=0)
+        total = len(self)
+        return {
+            q_id: {CORRECT: int(correct[j]), WRONG: int(answered[j] - correct[j]), SKIPPED: int(total - answered[j])}
+            for j, q_id in enumerate(self.question_ids)
+        }
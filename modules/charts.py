@@ -0,0 +1,219 @@
+import io
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
+from database_helper import get_setting
+
+# Cách vẽ biểu đồ: "png" (matplotlib vẽ sẵn trên server) hoặc "vega" (gửi đặc tả
+# Vega-Lite cho trình duyệt tự vẽ, có tooltip và phóng to)
+CHART_RENDERER = str(get_setting("CHART_RENDERER", "png")).lower()
+# Số ảnh biểu đồ tối đa giữ trong cache (bỏ ảnh ít dùng nhất khi đầy)
+CHART_CACHE_SIZE = int(get_setting("CHART_CACHE_SIZE", 64))
+CHART_DPI = 100
+
+
+class ChartCache:
+    """Cache LRU các ảnh PNG đã vẽ, khóa là mã băm của dữ liệu và tham số biểu đồ"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        # Vẽ ngoài khóa: hai phiên cùng vẽ một biểu đồ chỉ tốn thêm một lần vẽ
+        image = render()
+        with self._lock:
+            self._items[key] = image
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_cache = ChartCache(CHART_CACHE_SIZE)
+
+
+def get_chart_cache_stats():
+    return _cache.stats()
+
+
+def chart_key(kind, data, params):
+    """Mã băm của loại biểu đồ, dữ liệu (DataFrame) và tham số vẽ"""
+    digest = hashlib.sha1(kind.encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    digest.update(json.dumps([str(c) for c in data.columns], ensure_ascii=False).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _draw_line(fig, data, params):
+    ax = fig.subplots()
+    ax.plot(data[params["x"]], data[params["y"]], marker='o')
+    ax.set_ylabel(params["y_title"])
+    ax.set_xlabel(params["x_title"])
+    ax.grid(True, linestyle='--', alpha=0.7)
+
+    # Giảm số lượng tick trên trục x
+    max_ticks = 6
+    if len(data) > max_ticks:
+        stride = len(data) // max_ticks
+        ax.set_xticks(data[params["x"]][::stride])
+
+
+def _draw_histogram(fig, data, params):
+    ax = fig.subplots()
+    ax.hist(data["value"], weights=data["count"], bins=params["bins"], alpha=0.7, color='skyblue', edgecolor='black')
+    ax.set_xlabel(params["x_title"])
+    ax.set_ylabel(params["y_title"])
+    ax.grid(True, linestyle='--', alpha=0.3)
+
+
+def _draw_bar(fig, data, params):
+    ax = fig.subplots()
+    bars = ax.bar(data["label"].astype(str), data["value"], color='skyblue')
+
+    # Thêm nhãn giá trị
+    if params.get("value_format"):
+        for bar in bars:
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height + 1,
+                    params["value_format"].format(height), ha='center', va='bottom', fontsize=9)
+
+    if params.get("y_max") is not None:
+        ax.set_ylim(0, params["y_max"])
+    ax.set_xlabel(params["x_title"])
+    ax.set_ylabel(params["y_title"])
+    if params.get("title"):
+        ax.set_title(params["title"])
+    if params.get("grid"):
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+    if params.get("rotate_labels"):
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+
+
+def _draw_donut(fig, data, params):
+    ax = fig.subplots()
+    # Chỉ hiển thị phần trăm nếu giá trị > 0
+    patches, texts, autotexts = ax.pie(
+        data["value"],
+        labels=None,  # Không hiển thị nhãn trên biểu đồ
+        colors=list(data["color"]),
+        autopct=lambda p: f'{p:.1f}%' if p > 0 else '',
+        startangle=90,
+        pctdistance=0.85  # Đặt phần trăm gần hơn với trung tâm
+    )
+    for autotext in autotexts:
+        autotext.set_fontsize(9)
+
+    # Chú thích bên ngoài biểu đồ và vòng tròn trắng ở giữa
+    ax.legend(list(data["label"]), loc="upper right", fontsize=9)
+    ax.add_patch(Circle((0, 0), 0.5, fc='white'))
+    ax.axis('equal')  # Giữ tỷ lệ vòng tròn
+
+
+def _spec_line(data, params):
+    return {
+        "mark": {"type": "line", "point": True},
+        "encoding": {
+            "x": {"field": params["x"], "type": "temporal", "title": params["x_title"]},
+            "y": {"field": params["y"], "type": "quantitative", "title": params["y_title"]},
+            "tooltip": [{"field": c, "type": "temporal" if c == params["x"] else "quantitative"} for c in data.columns],
+        },
+    }
+
+
+def _spec_histogram(data, params):
+    return {
+        "mark": {"type": "bar", "color": "skyblue", "stroke": "black"},
+        "encoding": {
+            "x": {"field": "value", "type": "quantitative", "bin": {"maxbins": params["bins"]}, "title": params["x_title"]},
+            "y": {"aggregate": "sum", "field": "count", "type": "quantitative", "title": params["y_title"]},
+        },
+    }
+
+
+def _spec_bar(data, params):
+    y = {"field": "value", "type": "quantitative", "title": params["y_title"]}
+    if params.get("y_max") is not None:
+        y["scale"] = {"domain": [0, params["y_max"]]}
+    return {
+        "title": params.get("title") or "",
+        "mark": {"type": "bar", "color": "skyblue"},
+        "encoding": {
+            "x": {"field": "label", "type": "nominal", "sort": None, "title": params["x_title"]},
+            "y": y,
+            "tooltip": [{"field": "label", "type": "nominal"}, {"field": "value", "type": "quantitative", "format": ".1f"}],
+        },
+    }
+
+
+def _spec_donut(data, params):
+    return {
+        "mark": {"type": "arc", "innerRadius": 50},
+        "encoding": {
+            "theta": {"field": "value", "type": "quantitative"},
+            "color": {"field": "label", "type": "nominal", "sort": None,
+                      "scale": {"domain": list(data["label"]), "range": list(data["color"])}},
+            "tooltip": [{"field": "label", "type": "nominal"}, {"field": "value", "type": "quantitative"}],
+        },
+    }
+
+
+_CHARTS = {
+    "line": (_draw_line, _spec_line),
+    "histogram": (_draw_histogram, _spec_histogram),
+    "bar": (_draw_bar, _spec_bar),
+    "donut": (_draw_donut, _spec_donut),
+}
+
+
+def render_png(kind, data, params, figsize):
+    """Vẽ biểu đồ bằng matplotlib (không dùng trạng thái chung của pyplot), trả về ảnh PNG"""
+    fig = Figure(figsize=figsize)
+    _CHARTS[kind][0](fig, data, params)
+    fig.tight_layout()  # Đảm bảo không bị cắt chữ
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=CHART_DPI)
+    return buffer.getvalue()
+
+
+def vega_spec(kind, data, params):
+    """Đặc tả Vega-Lite của biểu đồ (dữ liệu truyền riêng cho st.vega_lite_chart)"""
+    return _CHARTS[kind][1](data, params)
+
+
+def show_chart(kind, data, params, figsize=(10, 5), renderer=None):
+    """Hiển thị biểu đồ: ảnh PNG lấy từ cache hoặc đặc tả Vega-Lite cho trình duyệt"""
+    renderer = renderer or CHART_RENDERER
+    if renderer == "vega":
+        st.vega_lite_chart(data, vega_spec(kind, data, params), use_container_width=True)
+        return
+    key = chart_key(kind, data, dict(params, figsize=list(figsize), dpi=CHART_DPI))
+    image = _cache.get_or_render(key, lambda: render_png(kind, data, params, figsize))
+    st.image(image, use_container_width=True)
@@ -0,0 +1,144 @@
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+
+DOCUMENT_PART = "word/document.xml"
+# Đánh dấu vị trí các dòng dữ liệu trong document.xml của bản mẫu
+ROWS_MARKER = "__DATAFRAME_ROWS__"
+# Số dòng sinh XML mỗi lần ghi (giới hạn bộ nhớ khi bảng rất lớn)
+ROW_CHUNK_SIZE = 500
+
+HEADER_STYLE = "Tiêu đề bảng"
+CELL_STYLE = "Ô bảng"
+
+# Ký tự điều khiển không hợp lệ trong XML
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ROW_OPEN = re.compile("<w:tr[ >]")
+_LINE_BREAK = '</w:t><w:br/><w:t xml:space="preserve">'
+
+
+def _xml_text(value):
+    """Chuỗi đã escape để đặt trong <w:t>, xuống dòng thành <w:br/> như cell.text của python-docx"""
+    text = escape(_INVALID_XML_CHARS.sub("", str(value)))
+    return text.replace("\r\n", "\n").replace("\n", _LINE_BREAK)
+
+
+def _build_template(columns, title):
+    """Dựng phần khung của tài liệu (tiêu đề, hàng tiêu đề cột, chân trang) bằng python-docx.
+
+    Kiểu chữ của ô được khai báo một lần trong styles.xml; mỗi ô dữ liệu chỉ tham
+    chiếu tới kiểu qua <w:pStyle>. Trả về (gói DOCX mẫu, style id của ô, độ rộng các cột).
+    """
+    doc = Document()
+
+    # Thiết lập font chữ mặc định
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Times New Roman'
+    font.size = Pt(12)
+
+    # Kiểu cho ô dữ liệu (căn giữa) và hàng tiêu đề cột (căn giữa, in đậm)
+    cell_style = doc.styles.add_style(CELL_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    cell_style.base_style = style
+    cell_style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    header_style = doc.styles.add_style(HEADER_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    header_style.base_style = cell_style
+    header_style.font.bold = True
+
+    # Thêm tiêu đề
+    heading = doc.add_heading(title, level=1)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Thêm thời gian xuất báo cáo
+    time_paragraph = doc.add_paragraph(f"Thời gian xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    time_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+
+    # Bảng với hàng tiêu đề cột và một hàng đánh dấu, thay bằng dữ liệu khi ghi
+    table = doc.add_table(rows=2, cols=len(columns), style='Table Grid')
+    for cell, col_name in zip(table.rows[0].cells, columns):
+        cell.text = str(col_name)
+        cell.paragraphs[0].style = header_style
+    table.rows[1].cells[0].text = ROWS_MARKER
+    widths = [column.width.twips for column in table.columns]
+
+    # Thêm chân trang
+    doc.add_paragraph()
+    footer = doc.add_paragraph("Hệ thống Khảo sát & Đánh giá")
+    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    package = io.BytesIO()
+    doc.save(package)
+    package.seek(0)
+    return package, cell_style.style_id, widths
+
+
+def _split_document(document_xml):
+    """Tách document.xml thành phần trước và sau hàng đánh dấu"""
+    marker = document_xml.index(ROWS_MARKER)
+    row_start = [m.start() for m in _ROW_OPEN.finditer(document_xml, 0, marker)][-1]
+    row_end = document_xml.index("</w:tr>", marker) + len("</w:tr>")
+    return document_xml[:row_start], document_xml[row_end:]
+
+
+def iter_table_rows(df, style_id, widths, chunk_size=ROW_CHUNK_SIZE, formatter=None):
+    """Sinh XML các hàng <w:tr> của bảng theo từng khối dòng, đọc dữ liệu theo cột
+
+    formatter(khối dòng) trả về bản hiển thị của khối trước khi đổi thành chuỗi.
+    """
+    cell_open = [
+        f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+        f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr><w:r><w:t xml:space="preserve">'
+        for width in widths
+    ]
+    cell_close = "</w:t></w:r></w:p></w:tc>"
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        if formatter:
+            chunk = formatter(chunk)
+        # Mỗi giá trị khác nhau của một cột chỉ escape một lần, sau đó ghép theo hàng
+        columns = []
+        for j in range(len(widths)):
+            codes, uniques = pd.factorize(chunk.iloc[:, j], use_na_sentinel=False)
+            columns.append(np.array([_xml_text(v) for v in uniques], dtype=object)[codes].tolist())
+        parts = []
+        for values in zip(*columns):
+            parts.append("<w:tr>")
+            for opening, value in zip(cell_open, values):
+                parts.append(opening)
+                parts.append(value)
+                parts.append(cell_close)
+            parts.append("</w:tr>")
+        yield "".join(parts)
+
+
+def write_dataframe_docx(df, title, target, progress=None, formatter=None):
+    """Ghi DataFrame thành bảng DOCX vào target (đường dẫn hoặc file nhị phân đang mở).
+
+    document.xml được ghi thẳng vào file ZIP theo từng khối dòng, không dựng đối
+    tượng python-docx cho từng ô. progress(số dòng đã ghi, tổng số dòng) được gọi
+    sau mỗi khối; formatter như iter_table_rows.
+    """
+    template, style_id, widths = _build_template(list(df.columns), title)
+    with zipfile.ZipFile(template) as source, \
+            zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as output:
+        for item in source.infolist():
+            if item.filename != DOCUMENT_PART:
+                output.writestr(item, source.read(item.filename))
+                continue
+            prefix, suffix = _split_document(source.read(item.filename).decode("utf-8"))
+            with output.open(DOCUMENT_PART, "w") as part:
+                part.write(prefix.encode("utf-8"))
+                for i, rows in enumerate(iter_table_rows(df, style_id, widths, formatter=formatter), 1):
+                    part.write(rows.encode("utf-8"))
+                    if progress:
+                        progress(min(i * ROW_CHUNK_SIZE, len(df)), len(df))
+                part.write(suffix.encode("utf-8"))
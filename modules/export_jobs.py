@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database_helper import get_setting
+
+# Số báo cáo được tạo đồng thời ở nền
+EXPORT_WORKERS = int(get_setting("EXPORT_WORKERS", 2))
+# Thư mục cache các file báo cáo đã tạo và số báo cáo tối đa giữ lại (bỏ báo cáo cũ nhất)
+EXPORT_CACHE_DIR = get_setting("EXPORT_CACHE_DIR", "data/exports")
+EXPORT_CACHE_MAX_ENTRIES = int(get_setting("EXPORT_CACHE_MAX_ENTRIES", 50))
+# Thời gian (giây) dùng lại một file báo cáo đã tạo, quá hạn thì tạo lại
+EXPORT_CACHE_TTL = float(get_setting("EXPORT_CACHE_TTL", 86400))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Công việc xuất báo cáo bị hủy giữa chừng"""
+
+
+class ExportJob:
+    """Một lần tạo file báo cáo chạy ở nền"""
+
+    def __init__(self, key, filename, path, build=None, status=QUEUED):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.filename = filename
+        self.path = path
+        self.build = build
+        self.status = status
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def progress(self, done, total):
+        """Cập nhật tiến độ; dừng công việc nếu đã có yêu cầu hủy"""
+        self.done = done
+        self.total = total
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+
+
+class ExportJobQueue:
+    """Hàng đợi tạo báo cáo ở nền, kết quả cache trên đĩa.
+
+    Mỗi báo cáo có khóa là mã băm của (loại báo cáo, phiên bản dữ liệu, tham số).
+    Yêu cầu lặp lại cùng khóa dùng lại công việc đang chạy hoặc file đã tạo
+    (file tạo quá ttl giây trước được coi như chưa có).
+    """
+
+    def __init__(self, cache_dir, workers, max_entries, ttl=None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_key(kind, version, params=None):
+        payload = json.dumps([kind, version, params], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _cache_path(self, key, filename):
+        return os.path.join(self.cache_dir, key, filename)
+
+    def _expired(self, path):
+        return self.ttl is not None and time.time() - os.path.getmtime(path) >= self.ttl
+
+    def _usable(self, path):
+        """File báo cáo còn trong cache và chưa quá hạn"""
+        try:
+            return not self._expired(path)
+        except OSError:
+            return False
+
+    def lookup(self, key, filename):
+        """Công việc của khóa này (đang chạy, lỗi hoặc đã xong); file trong cache coi như đã xong"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and (job.status != DONE or self._usable(job.path)):
+                return job
+            path = self._cache_path(key, filename)
+            if self._usable(path):
+                job = ExportJob(key, filename, path, status=DONE)
+                self._jobs[key] = job
+                return job
+            return None
+
+    def submit(self, key, filename, build):
+        """Đưa vào hàng đợi; build(path, job) ghi file và gọi job.progress(đã xong, tổng số)"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.active:
+                return job
+            job = ExportJob(key, filename, self._cache_path(key, filename), build)
+            self._jobs[key] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return next((job for job in self._jobs.values() if job.id == job_id), None)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None and job.active:
+            job.cancel()
+        return job
+
+    def jobs(self):
+        """Các công việc, mới nhất trước"""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def _run(self, job):
+        if job._cancel.is_set():
+            job.status = CANCELLED
+            return
+        job.status = RUNNING
+        directory = os.path.dirname(job.path)
+        partial = job.path + ".part"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            job.build(partial, job)
+            os.replace(partial, job.path)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            print(f"Error building export {job.filename}: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            if job.status != DONE:
+                shutil.rmtree(directory, ignore_errors=True)
+        self._prune()
+
+    def _prune(self):
+        """Giữ tối đa max_entries báo cáo chưa quá hạn trong cache, xóa báo cáo cũ nhất trước"""
+        try:
+            with self._lock:
+                active = {job.key for job in self._jobs.values() if job.active}
+                entries = [
+                    os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                    if name not in active and os.path.isdir(os.path.join(self.cache_dir, name))
+                ]
+                entries.sort(key=os.path.getmtime, reverse=True)
+                stale = entries[self.max_entries:] + [e for e in entries[:self.max_entries] if self._expired(e)]
+                for entry in stale:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    self._jobs.pop(os.path.basename(entry), None)
+        except Exception as e:
+            print(f"Error pruning export cache: {e}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_export_queue():
+    """Hàng đợi xuất báo cáo dùng chung cho cả tiến trình"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ExportJobQueue(EXPORT_CACHE_DIR, EXPORT_WORKERS, EXPORT_CACHE_MAX_ENTRIES, EXPORT_CACHE_TTL)
+        return _queue
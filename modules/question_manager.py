@@ -165,7 +165,7 @@ def list_questions():
                     st.rerun()
                     
         if st.button("🔄 Làm mới danh sách", key="refresh_question_list"):
-            st.session_state.db_questions = get_all_questions()
+            st.session_state.db_questions = get_all_questions(force_refresh=True)
             st.rerun()
 
 def edit_question():
@@ -0,0 +1,516 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from database_helper import fetch_report_bundle, get_grader, get_latest_submission_cursor, get_setting
+from grading import CorrectnessMatrix, QuestionResult, CORRECT, WRONG, SKIPPED
+
+UNKNOWN = "Không xác định"
+
+# Thời gian tối đa (giây) dùng lại một bộ dữ liệu báo cáo khi không có bài nộp mới
+# (hết hạn thì đọc lại danh sách học viên để học viên vừa đăng ký cũng được cập nhật)
+REPORT_DATASET_TTL = float(get_setting("REPORT_DATASET_TTL", 300))
+# Số tiến trình dựng báo cáo hàng loạt (mặc định bằng số lõi CPU)
+REPORT_WORKERS = int(get_setting("REPORT_WORKERS", os.cpu_count() or 1))
+# Số điểm tối đa của biểu đồ điểm theo thời gian (bài nộp được gộp theo khoảng thời gian)
+TIMELINE_MAX_POINTS = int(get_setting("TIMELINE_MAX_POINTS", 200))
+# Số giây đọc lại phía sau bài nộp mới nhất đã có: thời gian nộp do ứng dụng gán trước khi
+# ghi, nên một bài nộp có thể được ghi xong muộn hơn các bài có thời gian nộp lớn hơn nó
+STATS_LAG_SECONDS = float(get_setting("STATS_LAG_SECONDS", 300))
+
+# Các độ rộng khoảng gộp (tên hiển thị, số giây), chọn khoảng nhỏ nhất vừa số điểm tối đa
+TIMELINE_BUCKETS = [("phút", 60), ("giờ", 3600), ("ngày", 86400), ("tuần", 7 * 86400)]
+# 1970-01-01 là thứ Năm: lùi 3 ngày để khoảng tuần bắt đầu từ thứ Hai
+_WEEK_ORIGIN = 3 * 86400
+
+
+class ReportDataset:
+    """Dữ liệu báo cáo dựng một lần cho mỗi lần tải trang thống kê.
+
+    Bài nộp là DataFrame theo cột của database_helper.load_submissions_frame (mới
+    nhất trước). Đánh chỉ mục học viên theo email và vị trí bài nộp theo học viên
+    để các tab và phần xuất báo cáo tra cứu trực tiếp thay vì duyệt lại bảng.
+    """
+
+    def __init__(self, grader, submissions, students):
+        self.grader = grader
+        self.questions = grader.questions
+        self.submissions = submissions.reset_index(drop=True)
+        self.students = students
+        self.max_possible = grader.max_score
+
+        self.users_by_email = {student["email"]: student for student in students}
+        self.students_fingerprint = _students_fingerprint(students)
+        frame = self.submissions
+        self.ids = frame["id"].to_numpy(dtype=np.int64)
+        self.timestamps = frame["timestamp"].to_numpy(dtype=np.int64)
+        self.row_of_id = dict(zip(self.ids.tolist(), range(len(frame))))
+
+        # Điểm đã lưu của từng bài nộp; số bài và điểm cao nhất theo học viên (rút gọn NumPy theo mã email)
+        self.scores = frame["score"].to_numpy(dtype=np.int64)
+        emails = frame["user_email"].astype("category")
+        codes = emails.cat.codes.to_numpy()
+        categories = list(emails.cat.categories)
+        counts = np.bincount(codes, minlength=len(categories))
+        best = np.full(len(categories), np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(best, codes, self.scores)
+        # Vị trí các bài nộp của từng học viên, giữ thứ tự mới nhất trước
+        order = np.argsort(codes, kind="stable")
+        self._rows_by_user = {}
+        self._best_scores = {}
+        for email, rows, count, best_score in zip(categories, np.split(order, np.cumsum(counts)[:-1]), counts, best):
+            if count:
+                self._rows_by_user[email] = rows
+                self._best_scores[email] = int(best_score)
+        self._matrix = None
+        # Vị trí các bài nộp extend() vừa gộp thêm và thống kê của phiên bản trước đó
+        # (None: dựng từ đầu), để thống kê tổng quan chỉ cộng thêm các dòng mới
+        self.added_rows = None
+        self.previous_stats = None
+
+        # Kết quả tính toán của từng phần báo cáo, gắn với phiên bản bộ dữ liệu này
+        self.version = None
+        self._memo = {}
+        self._memo_lock = threading.RLock()
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        """Dựng từ ReportBundle của database_helper.fetch_report_bundle()"""
+        return cls(bundle.grader, bundle.submissions, bundle.students)
+
+    def extend(self, bundle):
+        """Bộ dữ liệu mới gồm các bài nộp hiện có và các bài nộp trong bundle chưa có (theo ID)
+
+        Dùng khi ngân hàng câu hỏi không đổi: không đọc lại lịch sử, ma trận đã chấm
+        được giữ lại và chỉ chấm thêm các bài mới. Danh sách học viên lấy từ bundle.
+        """
+        added = bundle.submissions
+        added = added[~added["id"].isin(self.ids)].reset_index(drop=True)
+        if not len(added):
+            dataset = ReportDataset(self.grader, self.submissions, bundle.students)
+            dataset._matrix = self._matrix
+            dataset.added_rows = np.zeros(0, dtype=np.int64)
+            dataset.previous_stats = self._memo.get("stats")
+            return dataset
+
+        frame = pd.concat([added, self.submissions], ignore_index=True)
+        # Bài nộp ghi xong muộn có thể có thời gian nộp cũ hơn bài đã có: sắp lại mới nhất trước
+        order = np.lexsort((frame["id"].to_numpy(), frame["timestamp"].to_numpy()))[::-1]
+        frame = frame.take(order).reset_index(drop=True)
+        for column in ("user_email", "grader_version", "options_version"):
+            if column in frame:
+                frame[column] = frame[column].astype("category")
+        dataset = ReportDataset(self.grader, frame, bundle.students)
+        if self._matrix is not None:
+            dataset._matrix = self._matrix.stacked(_frame_matrix(self.grader, added), order)
+        # Các bài mới đứng trước trong bảng đã nối nên có chỉ số nhỏ hơn len(added)
+        dataset.added_rows = np.flatnonzero(order < len(added))
+        dataset.previous_stats = self._memo.get("stats")
+        return dataset
+
+    def student_name(self, email):
+        student = self.users_by_email.get(email)
+        return student["full_name"] if student else UNKNOWN
+
+    def student_class(self, email):
+        student = self.users_by_email.get(email)
+        return student["class"] if student else UNKNOWN
+
+    def submission(self, submission_id):
+        """Một bài nộp dạng dict (id, user_email, timestamp, score, responses...), None nếu không có"""
+        row = self.row_of_id.get(submission_id)
+        if row is None:
+            return None
+        record = self.submissions.iloc[row]
+        return {column: _python_value(record[column]) for column in self.submissions.columns}
+
+    def user_rows(self, email):
+        """Vị trí các bài nộp của một học viên trong bảng bài nộp (mới nhất trước)"""
+        return self._rows_by_user.get(email, np.zeros(0, dtype=np.int64))
+
+    def submission_summary(self, row):
+        """id, thời gian nộp và điểm của bài nộp ở một vị trí"""
+        return {"id": int(self.ids[row]), "timestamp": int(self.timestamps[row]), "score": int(self.scores[row])}
+
+    def cached(self, name, builder):
+        """Tính một phần dữ liệu báo cáo khi cần lần đầu, các lần sau dùng lại"""
+        with self._memo_lock:
+            if name not in self._memo:
+                self._memo[name] = builder()
+            return self._memo[name]
+
+    def is_cached(self, name):
+        return name in self._memo
+
+    @property
+    def matrix(self):
+        """Ma trận đúng/sai của mọi bài nộp theo đáp án hiện tại (dùng kết quả đã lưu nếu còn đúng phiên bản)"""
+        with self._memo_lock:
+            if self._matrix is None:
+                self._matrix = _frame_matrix(self.grader, self.submissions)
+            return self._matrix
+
+    def question_results(self, submission_id):
+        """Kết quả từng câu của một bài nộp (QuestionResult) lấy từ ma trận đã chấm, không chấm lại"""
+        row = self.row_of_id[submission_id]
+        responses = self.submissions["responses"].iat[row]
+        matrix = self.matrix
+        correct_row = matrix.correct[row]
+        results = []
+        for q in self.questions:
+            key = self.grader.keys[str(q["id"])]
+            user_answers = self.grader.decode_answers(key.question_id, responses.get(key.question_id))
+            is_correct = bool(correct_row[matrix.column_of[key.question_id]])
+            if is_correct:
+                status = CORRECT
+            elif not user_answers:
+                status = SKIPPED
+            else:
+                status = WRONG
+            results.append(QuestionResult(q, user_answers, key.expected, is_correct, status,
+                                          key.score if is_correct else 0))
+        return results
+
+    def correct_count(self, submission_id):
+        """Số câu đúng của một bài nộp"""
+        return int(self.matrix.correct[self.row_of_id[submission_id]].sum())
+
+    def best_score(self, email):
+        """Điểm cao nhất của một học viên, 0 nếu chưa làm bài"""
+        return self._best_scores.get(email, 0)
+
+    def best_scores(self):
+        """Điểm cao nhất của từng học viên đã nộp bài (email -> điểm)"""
+        return dict(self._best_scores)
+
+    def submission_counts(self):
+        """Số lần nộp bài của từng học viên (email -> số bài)"""
+        return {email: len(rows) for email, rows in self._rows_by_user.items()}
+
+    def submitted_emails(self):
+        """Email các học viên đã nộp bài"""
+        return list(self._rows_by_user.keys())
+
+    def classes(self):
+        """Các lớp có bài nộp (bỏ qua học viên không xác định)"""
+        return sorted({self.student_class(email) for email in self._rows_by_user} - {UNKNOWN})
+
+
+def _frame_matrix(grader, frame):
+    """Ma trận đúng/sai của một frame bài nộp (dùng kết quả đã lưu nếu còn đúng phiên bản)"""
+    missing = [None] * len(frame)
+    return CorrectnessMatrix.from_columns(
+        grader, frame["responses"].tolist(),
+        frame["results"].tolist() if "results" in frame else missing,
+        frame["grader_version"].tolist() if "grader_version" in frame else missing
+    )
+
+
+def _students_fingerprint(students):
+    """Mã băm danh sách học viên (tên, lớp, ngày đăng ký), không phụ thuộc thứ tự"""
+    payload = sorted(json.dumps(s, sort_keys=True, ensure_ascii=False, default=str) for s in students)
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def _python_value(value):
+    """Giá trị Python thuần từ một ô DataFrame (số NumPy thành int/float)"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Bộ dữ liệu báo cáo dùng chung giữa các phiên admin, gắn với phiên bản
+# (mã băm nội dung ngân hàng câu hỏi, con trỏ bài nộp mới nhất)
+_current = {"dataset": None, "loaded_at": 0.0}
+_current_lock = threading.Lock()
+
+
+def get_report_dataset(force_reload=False):
+    """Lấy bộ dữ liệu báo cáo.
+
+    Tải toàn bộ lần đầu, khi bấm tải lại hoặc khi ngân hàng câu hỏi thay đổi (nội
+    dung, đáp án, điểm). Khi có bài nộp mới hoặc hết hạn, chỉ đọc các bài nộp từ
+    STATS_LAG_SECONDS giây trước bài mới nhất đã có cùng danh sách học viên rồi gộp vào.
+    """
+    grader = get_grader()
+    cursor = get_latest_submission_cursor()
+    with _current_lock:
+        dataset = _current["dataset"]
+        fresh = time.time() - _current["loaded_at"] < REPORT_DATASET_TTL
+    if (not force_reload and dataset is not None and fresh and cursor is not None
+            and dataset.version == (grader.content_fingerprint, cursor)):
+        return dataset
+
+    if force_reload or dataset is None or dataset.grader.content_fingerprint != grader.content_fingerprint:
+        dataset = ReportDataset.from_bundle(fetch_report_bundle())
+    else:
+        start = None
+        if len(dataset.timestamps):
+            start = datetime.fromtimestamp(int(dataset.timestamps.max()) - STATS_LAG_SECONDS)
+        bundle = fetch_report_bundle(start=start)
+        if bundle.submissions is None:
+            # Lỗi đọc: giữ bộ dữ liệu cũ, lần sau đọc lại từ cùng mốc
+            return dataset
+        dataset = dataset.extend(bundle)
+    dataset.version = (dataset.grader.content_fingerprint, cursor)
+    with _current_lock:
+        _current["dataset"] = dataset
+        _current["loaded_at"] = time.time()
+    return dataset
+
+
+def format_date(date_value):
+    """Định dạng ngày tháng từ nhiều kiểu dữ liệu khác nhau"""
+    if not date_value:
+        return "N/A"
+    
+    try:
+        # Nếu là số nguyên (timestamp)
+        if isinstance(date_value, (int, float)):
+            return datetime.fromtimestamp(date_value).strftime("%d/%m/%Y")
+        
+        # Nếu là chuỗi ISO (từ Supabase)
+        elif isinstance(date_value, str):
+            try:
+                # Thử parse chuỗi ISO
+                dt = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
+                return dt.strftime("%d/%m/%Y")
+            except:
+                # Nếu không phải ISO, trả về nguyên bản
+                return date_value
+        
+        # Nếu đã là đối tượng datetime
+        elif isinstance(date_value, datetime):
+            return date_value.strftime("%d/%m/%Y")
+            
+        # Các trường hợp khác, trả về dạng chuỗi
+        else:
+            return str(date_value)
+    except Exception as e:
+        print(f"Error formatting date: {e}, value type: {type(date_value)}, value: {date_value}")
+        return "N/A"
+
+
+def format_timestamps(timestamps, fmt):
+    """Định dạng cả cột epoch (giây) theo giờ địa phương, mỗi giá trị khác nhau chỉ định dạng một lần"""
+    values, inverse = np.unique(np.asarray(timestamps, dtype=np.int64), return_inverse=True)
+    labels = np.array([datetime.fromtimestamp(t).strftime(fmt) for t in values.tolist()], dtype=object)
+    return labels[inverse.reshape(-1)]
+
+
+def local_datetimes(timestamps):
+    """Cột epoch (giây) thành datetime64 theo giờ địa phương, mỗi giá trị khác nhau chỉ đổi một lần"""
+    values, inverse = np.unique(np.asarray(timestamps, dtype=np.int64), return_inverse=True)
+    local = np.array([datetime.fromtimestamp(t) for t in values.tolist()], dtype="datetime64[s]")
+    return local[inverse.reshape(-1)]
+
+
+def _student_columns(dataset):
+    """Tên và lớp của từng bài nộp, tra một lần cho mỗi email"""
+    emails = dataset.submissions["user_email"].astype(object).to_numpy()
+    codes, unique = pd.factorize(emails)
+    names = np.array([dataset.student_name(e) for e in unique], dtype=object)
+    classes = np.array([dataset.student_class(e) for e in unique], dtype=object)
+    return emails, names[codes], classes[codes]
+
+
+def _answer_column(grader, q_id, responses):
+    """Câu trả lời của một câu hỏi dạng category: mỗi mặt nạ khác nhau chỉ giải mã và ghép chuỗi một lần"""
+    labels = []
+    code_of_label = {}
+    code_of_mask = {}
+    codes = np.empty(len(responses), dtype=np.int32)
+    for i, r in enumerate(responses):
+        value = r.get(q_id)
+        code = code_of_mask.get(value) if type(value) is int else None
+        if code is None:
+            user_ans = grader.decode_answers(q_id, value)
+            label = ", ".join(user_ans) if user_ans else "Không trả lời"
+            code = code_of_label.get(label)
+            if code is None:
+                code = code_of_label[label] = len(labels)
+                labels.append(label)
+            if type(value) is int:
+                code_of_mask[value] = code
+        codes[i] = code
+    return pd.Categorical.from_codes(codes, labels)
+
+
+def _percent_labels(scores, max_possible):
+    return [f"{(score/max_possible*100):.1f}%" for score in scores.tolist()]
+
+
+def build_submissions_frame(dataset):
+    """DataFrame tất cả bài nộp, mỗi câu hỏi gồm cột đáp án và cột Đúng/Sai
+
+    Các cột giữ dạng gọn: email, tên, lớp và câu trả lời là category, thời gian
+    nộp là datetime64, tỷ lệ đúng là số (%), Đúng/Sai là bool. Chuỗi hiển thị chỉ
+    được tạo khi xuất báo cáo (report_export.display_frame).
+    """
+    questions = dataset.questions
+    max_possible = dataset.max_possible
+    matrix = dataset.matrix
+    emails, names, classes = _student_columns(dataset)
+    columns = {
+        "ID": dataset.ids,
+        "Email": pd.Categorical(emails),
+        "Họ và tên": pd.Categorical(names),
+        "Lớp": pd.Categorical(classes),
+        "Thời gian nộp": local_datetimes(dataset.timestamps),
+        "Điểm số": dataset.scores,
+        "Điểm tối đa": np.full(len(emails), max_possible, dtype=np.int64),
+        "Tỷ lệ đúng": dataset.scores / max_possible * 100,
+    }
+    
+    # Câu trả lời của từng câu hỏi và đúng/sai lấy từ ma trận đã chấm
+    responses = dataset.submissions["responses"].tolist()
+    grader = dataset.grader
+    for q in questions:
+        q_id = str(q["id"])
+        columns[f"Câu {q_id}: {q['question']}"] = _answer_column(grader, q_id, responses)
+        columns[f"Câu {q_id} - Đúng/Sai"] = matrix.correct[:, matrix.column_of[q_id]]
+    
+    return pd.DataFrame(columns)
+
+
+def build_user_submissions_frame(dataset):
+    """DataFrame bài nộp theo học viên (tab Theo học viên)"""
+    max_possible = dataset.max_possible
+    emails, names, classes = _student_columns(dataset)
+    return pd.DataFrame({
+        "email": emails,
+        "full_name": names,
+        "class": classes,
+        "submission_id": dataset.ids,
+        "timestamp": format_timestamps(dataset.timestamps, "%H:%M:%S %d/%m/%Y"),
+        "score": dataset.scores,
+        "max_score": np.full(len(emails), max_possible, dtype=np.int64),
+        "percent": _percent_labels(dataset.scores, max_possible),
+    })
+
+
+def build_question_stats(questions, counts):
+    """Thống kê đúng/sai/bỏ qua của từng câu hỏi từ kết quả đếm (dạng Grader.tally)"""
+    question_stats = {}
+    for q in questions:
+        q_id = str(q["id"])
+        correct_count = counts[q_id][CORRECT]
+        wrong_count = counts[q_id][WRONG]
+        skip_count = counts[q_id][SKIPPED]
+        total = correct_count + wrong_count + skip_count
+        
+        question_stats[q_id] = {
+            "question": q["question"],
+            "correct": correct_count,
+            "wrong": wrong_count,
+            "skip": skip_count,
+            "total": total,
+            "correct_rate": correct_count / total if total > 0 else 0
+        }
+    return question_stats
+
+
+def build_question_stats_frame(question_stats):
+    """DataFrame thống kê câu hỏi"""
+    return pd.DataFrame([
+        {
+            "Câu hỏi ID": q_id,
+            "Nội dung": stats["question"],
+            "Số lượng đúng": stats["correct"],
+            "Số lượng sai": stats["wrong"],
+            "Bỏ qua": stats["skip"],
+            "Tổng số làm": stats["total"],
+            "Tỷ lệ đúng (%)": f"{stats['correct_rate']*100:.1f}%"
+        }
+        for q_id, stats in question_stats.items()
+    ])
+
+
+def build_student_rows(dataset, count_by_user, best_by_user):
+    """Dữ liệu danh sách học viên: số lần làm bài và điểm cao nhất"""
+    max_possible = dataset.max_possible
+    student_data = []
+    for student in dataset.students:
+        max_student_score = best_by_user.get(student["email"], 0)
+        student_data.append({
+            "full_name": student["full_name"],
+            "email": student["email"],
+            "class": student["class"],
+            "registration_date": format_date(student.get("registration_date")),
+            "submission_count": count_by_user.get(student["email"], 0),
+            "max_score": max_student_score,
+            "max_possible": max_possible,
+            "percent": f"{(max_student_score/max_possible*100):.1f}%" if max_possible > 0 else "N/A"
+        })
+    return student_data
+
+
+def build_students_list_frame(student_data):
+    """DataFrame danh sách học viên (tên cột tiếng Việt, dùng để xuất báo cáo)"""
+    return pd.DataFrame([
+        {
+            "Họ và tên": s["full_name"],
+            "Email": s["email"],
+            "Lớp": s["class"],
+            "Ngày đăng ký": s["registration_date"],
+            "Số lần làm bài": s["submission_count"],
+            "Điểm cao nhất": s["max_score"],
+            "Điểm tối đa": s["max_possible"],
+            "Tỷ lệ đúng": s["percent"]
+        } for s in student_data
+    ])
+
+
+def build_class_stats_frame(df_students):
+    """Thống kê theo lớp: số học viên, tổng số bài nộp, điểm cao nhất trung bình"""
+    class_stats = df_students.groupby("class").agg({
+        "email": "count",
+        "submission_count": "sum",
+        "max_score": "mean"
+    }).reset_index()
+    
+    class_stats.columns = ["Lớp", "Số học viên", "Tổng số bài nộp", "Điểm trung bình"]
+    class_stats["Điểm trung bình"] = class_stats["Điểm trung bình"].round(2)
+    return class_stats
+
+
+def pick_timeline_bucket(span_seconds, max_points=None):
+    """Chọn độ rộng khoảng gộp (tên, số giây) để số điểm không vượt quá max_points"""
+    max_points = max(1, max_points or TIMELINE_MAX_POINTS)
+    # Khoảng đầu và cuối có thể chỉ chứa một phần thời gian: tính dư 2 khoảng
+    for name, seconds in TIMELINE_BUCKETS:
+        if span_seconds // seconds + 2 <= max_points:
+            return name, seconds
+    # Lịch sử quá dài: gộp nhiều tuần vào một điểm
+    weeks = int(span_seconds // (7 * 86400 * max(1, max_points - 2))) + 1
+    return f"{weeks} tuần", weeks * 7 * 86400
+
+
+def build_timeline(timestamps, scores, max_points=None):
+    """Gộp bài nộp theo khoảng thời gian: số bài nộp và điểm trung bình của mỗi khoảng.
+
+    timestamps là epoch (giây). Khoảng được căn theo giờ địa phương (ngày bắt đầu
+    lúc 0h, tuần bắt đầu thứ Hai). Trả về (DataFrame timestamp/score/count, tên khoảng).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(timestamps):
+        return pd.DataFrame({"timestamp": [], "score": [], "count": []}), None
+
+    name, seconds = pick_timeline_bucket(timestamps.max() - timestamps.min(), max_points)
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    origin = offset + (_WEEK_ORIGIN if seconds % (7 * 86400) == 0 else 0)
+
+    buckets = np.floor((timestamps + origin) / seconds).astype(np.int64)
+    starts, inverse = np.unique(buckets, return_inverse=True)
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=scores) / counts
+
+    return pd.DataFrame({
+        "timestamp": [datetime.fromtimestamp(t) for t in (starts * seconds - origin).tolist()],
+        "score": np.round(means, 2),
+        "count": counts,
+    }), name
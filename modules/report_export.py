@@ -0,0 +1,286 @@
+import io
+import os
+import re
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt, Inches, RGBColor
+from grading import Grader
+from modules.docx_writer import write_dataframe_docx
+from modules.xlsx_writer import write_dataframes_xlsx
+
+# Định dạng hiển thị khi xuất: thời gian nộp, cột tỷ lệ đúng dạng số (%) và cột đúng/sai dạng bool
+TIME_FORMAT = "%d/%m/%Y %H:%M:%S"
+PERCENT_COLUMNS = {"Tỷ lệ đúng"}
+BOOL_LABELS = np.array(["Sai", "Đúng"], dtype=object)
+
+def display_frame(df):
+    """Bản hiển thị của một khối dòng báo cáo: bool thành Đúng/Sai, thời gian và tỷ lệ thành chuỗi
+
+    Bảng báo cáo giữ các cột dạng gọn (số, category, bool); hàm này được gọi cho
+    từng khối dòng khi ghi file nên không có lúc nào giữ cả bảng dạng chuỗi.
+    """
+    formatted = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == bool:
+            formatted[column] = BOOL_LABELS[values.to_numpy().astype(np.intp)]
+        elif values.dtype.kind == "M":
+            codes, uniques = pd.factorize(values)
+            formatted[column] = np.array(uniques.strftime(TIME_FORMAT), dtype=object)[codes]
+        elif column in PERCENT_COLUMNS and values.dtype.kind == "f":
+            formatted[column] = [f"{value:.1f}%" for value in values.tolist()]
+    if not formatted:
+        return df
+    df = df.copy(deep=False)
+    for column, values in formatted.items():
+        df[column] = values
+    return df
+
+def dataframe_to_docx(df, title, path, progress=None):
+    """Tạo file DOCX từ DataFrame (ghi thẳng ra file tại path)"""
+    write_dataframe_docx(df, title, path, progress=progress, formatter=display_frame)
+    return path
+
+def create_student_report_docx(student_name, student_email, student_class, submission, questions, max_possible, grader=None, results=None):
+    """Tạo báo cáo chi tiết bài làm của học viên dạng DOCX
+
+    results là kết quả chấm từng câu đã có sẵn (danh sách QuestionResult); nếu không
+    truyền, dùng kết quả đã lưu kèm bài nộp hoặc chấm lại bằng grader khi bộ đáp án đã đổi.
+    """
+    if results is None:
+        if grader is None:
+            grader = Grader(questions)
+        results = grader.submission_results(submission)
+    
+    doc = Document()
+    
+    # Thiết lập font chữ mặc định
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Times New Roman'
+    font.size = Pt(12)
+    
+    # Thêm tiêu đề
+    heading = doc.add_heading(f"Báo cáo chi tiết bài làm - {student_name}", level=1)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Thêm thông tin học viên
+    doc.add_heading("Thông tin học viên", level=2)
+    info_table = doc.add_table(rows=4, cols=2, style='Table Grid')
+    
+    # Thêm dữ liệu vào bảng thông tin
+    cells = info_table.rows[0].cells
+    cells[0].text = "Họ và tên"
+    cells[1].text = student_name
+    
+    cells = info_table.rows[1].cells
+    cells[0].text = "Email"
+    cells[1].text = student_email
+    
+    cells = info_table.rows[2].cells
+    cells[0].text = "Lớp"
+    cells[1].text = student_class
+    
+    cells = info_table.rows[3].cells
+    cells[0].text = "Thời gian nộp"
+    cells[1].text = datetime.fromtimestamp(submission["timestamp"]).strftime("%H:%M:%S %d/%m/%Y")
+    
+    # Tính toán thông tin về bài làm
+    total_correct = 0
+    total_questions = len(questions)
+    
+    doc.add_heading("Chi tiết câu trả lời", level=2)
+    
+    # Tạo bảng chi tiết câu trả lời
+    answers_table = doc.add_table(rows=1, cols=5, style='Table Grid')
+    
+    # Thêm tiêu đề cho bảng
+    header_cells = answers_table.rows[0].cells
+    headers = ["Câu hỏi", "Đáp án của học viên", "Đáp án đúng", "Kết quả", "Điểm"]
+    
+    for i, header in enumerate(headers):
+        header_cells[i].text = header
+        for paragraph in header_cells[i].paragraphs:
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            for run in paragraph.runs:
+                run.bold = True
+    
+    # Thêm dữ liệu câu trả lời
+    for r in results:
+        q = r.question
+        user_ans = r.user_answers
+        expected = r.expected
+        is_correct = r.is_correct
+        points = r.points
+        if is_correct:
+            total_correct += 1
+            result = "Đúng"
+        else:
+            result = "Sai"
+        
+        # Thêm hàng mới vào bảng
+        row_cells = answers_table.add_row().cells
+        
+        # Thêm thông tin câu hỏi
+        row_cells[0].text = f"Câu {q['id']}: {q['question']}"
+        row_cells[1].text = ", ".join(user_ans) if user_ans else "Không trả lời"
+        row_cells[2].text = ", ".join(expected)
+        row_cells[3].text = result
+        
+        # Đặt màu cho kết quả
+        for paragraph in row_cells[3].paragraphs:
+            run = paragraph.runs[0]
+            if is_correct:
+                run.font.color.rgb = RGBColor(0, 128, 0)  # Màu xanh lá cho đúng
+                run.bold = True
+            else:
+                run.font.color.rgb = RGBColor(255, 0, 0)  # Màu đỏ cho sai
+                run.bold = True
+        
+        row_cells[4].text = str(points)
+    
+    # Thêm tổng kết
+    doc.add_heading("Tổng kết", level=2)
+    summary_table = doc.add_table(rows=3, cols=2, style='Table Grid')
+    
+    cells = summary_table.rows[0].cells
+    cells[0].text = "Số câu đúng"
+    cells[1].text = f"{total_correct}/{total_questions}"
+    
+    cells = summary_table.rows[1].cells
+    cells[0].text = "Điểm số"
+    cells[1].text = f"{submission['score']}/{max_possible}"
+    
+    cells = summary_table.rows[2].cells
+    cells[0].text = "Tỷ lệ đúng"
+    cells[1].text = f"{(total_correct/total_questions*100):.1f}%"
+    
+    # Thêm chân trang
+    doc.add_paragraph()
+    footer = doc.add_paragraph("Xuất báo cáo từ Hệ thống Khảo sát & Đánh giá")
+    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    time_footer = doc.add_paragraph(f"Ngày xuất: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    time_footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Lưu tệp
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    
+    return buffer
+
+def export_to_excel(dataframes, sheet_names, path, progress=None):
+    """Tạo file Excel với nhiều sheet từ các DataFrame (ghi tuần tự ra file tại path)"""
+    write_dataframes_xlsx(dataframes, sheet_names, path, progress=progress, formatter=display_frame)
+    return path
+
+def export_to_csv(df, path, progress=None, chunk_size=5000):
+    """Tạo file CSV (UTF-8 có BOM để Excel đọc đúng tiếng Việt) từ DataFrame, ghi theo từng khối dòng"""
+    with open(path, "w", encoding="utf-8-sig", newline="") as output:
+        df.head(0).to_csv(output, index=False)
+        for start in range(0, len(df), chunk_size):
+            display_frame(df.iloc[start:start + chunk_size]).to_csv(output, index=False, header=False)
+            if progress:
+                progress(min(start + chunk_size, len(df)), len(df))
+    return path
+
+
+# Chọn bài nộp nào của mỗi học viên để tạo báo cáo hàng loạt
+BEST_SUBMISSION = "best"
+LATEST_SUBMISSION = "latest"
+
+# Ký tự không dùng được trong tên file
+_UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def safe_filename(name):
+    """Tên file hợp lệ trên mọi hệ điều hành (thay ký tự đặc biệt bằng _)"""
+    return _UNSAFE_FILENAME_CHARS.sub("_", str(name)).strip() or "_"
+
+
+def student_report_tasks(dataset, class_name=None, mode=BEST_SUBMISSION):
+    """Tham số dựng báo cáo cho mỗi học viên đã nộp bài, dùng kết quả chấm có sẵn của ReportDataset
+
+    mode chọn bài nộp có điểm cao nhất (mới nhất nếu bằng điểm) hoặc bài nộp mới nhất.
+    Trả về danh sách (tên file trong ZIP, tham số của create_student_report_docx).
+    """
+    tasks = []
+    for email in sorted(dataset.submitted_emails()):
+        student_class = dataset.student_class(email)
+        if class_name is not None and student_class != class_name:
+            continue
+        rows = dataset.user_rows(email)  # Mới nhất trước
+        if mode == LATEST_SUBMISSION:
+            submission = dataset.submission_summary(rows[0])
+        else:
+            # argmax lấy vị trí đầu tiên có điểm cao nhất, tức bài mới nhất khi bằng điểm
+            submission = dataset.submission_summary(rows[np.argmax(dataset.scores[rows])])
+        student_name = dataset.student_name(email)
+        arcname = f"{safe_filename(student_class)}/{safe_filename(student_name)}_{safe_filename(email)}.docx"
+        tasks.append((arcname, {
+            "student_name": student_name,
+            "student_email": email,
+            "student_class": student_class,
+            "submission": submission,
+            "questions": dataset.questions,
+            "max_possible": dataset.max_possible,
+            "results": dataset.question_results(submission["id"]),
+        }))
+    return tasks
+
+
+# Số báo cáo tối thiểu cho mỗi tiến trình con: khởi động một tiến trình "spawn" (nạp lại
+# Python, pandas, python-docx) mất vài giây, bằng thời gian dựng vài chục báo cáo
+MIN_REPORTS_PER_WORKER = 50
+
+
+def _render_student_report(task):
+    """Chạy trong tiến trình con: dựng một báo cáo, trả về (tên file, nội dung DOCX)"""
+    arcname, kwargs = task
+    return arcname, create_student_report_docx(**kwargs).getvalue()
+
+
+def write_student_reports_zip(tasks, target, workers=None, progress=None):
+    """Dựng báo cáo của từng học viên song song trên nhiều tiến trình và ghi dần vào file ZIP
+
+    Không dùng nhiều tiến trình hơn số lõi CPU, mỗi tiến trình nhận ít nhất
+    MIN_REPORTS_PER_WORKER báo cáo; ít báo cáo hơn thì
+    dựng tuần tự ngay trong tiến trình hiện tại. target là đường dẫn hoặc file nhị
+    phân đang mở; progress(đã xong, tổng số) được gọi sau mỗi báo cáo. Trả về số
+    báo cáo đã ghi.
+    """
+    total = len(tasks)
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, cpus, total // MIN_REPORTS_PER_WORKER)
+    # File DOCX đã được nén sẵn, không nén lại trong ZIP
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_STORED) as archive:
+        if workers <= 1:
+            reports = map(_render_student_report, tasks)
+            for done, (arcname, data) in enumerate(reports, 1):
+                archive.writestr(arcname, data)
+                if progress:
+                    progress(done, total)
+            return total
+
+        # "spawn": không fork tiến trình server đang chạy nhiều thread
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            futures = [executor.submit(_render_student_report, task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                arcname, data = future.result()
+                archive.writestr(arcname, data)
+                if progress:
+                    progress(done, total)
+        finally:
+            # Bị hủy hoặc lỗi: bỏ các báo cáo chưa chạy thay vì chờ hết
+            executor.shutdown(wait=True, cancel_futures=True)
+    return total
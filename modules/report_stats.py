@@ -0,0 +1,60 @@
+from collections import Counter
+
+import numpy as np
+from grading import CORRECT, WRONG, SKIPPED
+
+
+class DatasetStats:
+    """Thống kê tổng quan của một bộ dữ liệu báo cáo (ReportDataset).
+
+    Tính từ ma trận đúng/sai và điểm của chính bộ dữ liệu nên luôn khớp với các
+    bảng báo cáo trên cùng trang. Với bộ dữ liệu dựng bằng ReportDataset.extend(),
+    chỉ các bài nộp vừa gộp thêm được cộng vào thống kê của phiên bản trước.
+    """
+
+    def __init__(self, dataset, previous=None):
+        self.question_ids = list(dataset.grader.question_ids)
+        rows = dataset.added_rows
+        if previous is None or rows is None:
+            rows = slice(None)
+            self.correct = np.zeros(len(self.question_ids), dtype=np.int64)
+            self.answered = np.zeros(len(self.question_ids), dtype=np.int64)
+            self.score_sum = 0
+            self.score_max = 0
+            self.histogram = Counter()
+        else:
+            self.correct = previous.correct.copy()
+            self.answered = previous.answered.copy()
+            self.score_sum = previous.score_sum
+            self.score_max = previous.score_max
+            self.histogram = Counter(previous.histogram)
+
+        scores = dataset.scores[rows]
+        if len(scores):
+            matrix = dataset.matrix
+            self.correct += matrix.correct[rows].sum(axis=0)
+            self.answered += matrix.answered[rows].sum(axis=0)
+            self.score_sum += int(scores.sum())
+            self.score_max = max(self.score_max, int(scores.max()))
+            values, counts = np.unique(scores, return_counts=True)
+            self.histogram.update(dict(zip(values.tolist(), counts.tolist())))
+        self.total = len(dataset.ids)
+        # Số bài và điểm cao nhất theo học viên đã có sẵn trong chỉ mục của bộ dữ liệu
+        self.count_by_user = dataset.submission_counts()
+        self.best_by_user = dataset.best_scores()
+
+    def average_score(self):
+        return self.score_sum / self.total if self.total else 0
+
+    def question_counts(self):
+        """Số bài đúng/sai/bỏ qua của từng câu hỏi, dạng dict giống Grader.tally"""
+        return {
+            q_id: {CORRECT: int(self.correct[j]), WRONG: int(self.answered[j] - self.correct[j]),
+                   SKIPPED: int(self.total - self.answered[j])}
+            for j, q_id in enumerate(self.question_ids)
+        }
+
+
+def get_dataset_stats(dataset):
+    """Thống kê tổng quan của bộ dữ liệu, tính một lần cho mỗi phiên bản dữ liệu"""
+    return dataset.cached("stats", lambda: DatasetStats(dataset, dataset.previous_stats))
@@ -1,8 +1,11 @@
 import streamlit as st
-from database_helper import get_all_questions, save_submission, get_user_submissions
+from database_helper import get_grader, save_submission, get_user_submissions, get_submission_summary
 import time
 from datetime import datetime
 
+# Số lần làm bài tối đa của mỗi học viên
+MAX_ATTEMPTS = 3
+
 def survey_form(email, full_name, class_name):
     st.title("Làm bài khảo sát")
     
@@ -11,21 +14,22 @@ def survey_form(email, full_name, class_name):
     st.write(f"**Lớp:** {class_name}")
     st.write(f"**Email:** {email}")
     
-    # Lấy danh sách câu hỏi từ database
-    questions = get_all_questions()
+    # Lấy danh sách câu hỏi (kèm bộ chấm điểm) từ database
+    grader = get_grader()
+    questions = grader.questions
     
     if not questions:
         st.info("Chưa có câu hỏi nào trong hệ thống.")
         return
     
-    # Lấy lịch sử bài làm của học viên này
-    user_submissions = get_user_submissions(email)
-    
-    # Đếm số lần đã làm bài
-    submission_count = len(user_submissions)
+    # Số lần đã làm bài và điểm cao nhất (chỉ lấy số liệu tổng hợp, không tải bài làm)
+    summary = get_submission_summary(email)
+    if summary is None:
+        st.error("❌ Không lấy được số lần làm bài của bạn, vui lòng tải lại trang!")
+        return
+    submission_count = summary["count"]
     
-    # Kiểm tra giới hạn làm bài (tối đa 3 lần)
-    MAX_ATTEMPTS = 3
+    # Kiểm tra giới hạn làm bài
     remaining_attempts = MAX_ATTEMPTS - submission_count
     
     # Hiển thị số lần làm bài và giới hạn
@@ -33,7 +37,7 @@ def survey_form(email, full_name, class_name):
         st.write(f"**Số lần đã làm bài:** {submission_count}/{MAX_ATTEMPTS}")
         
         # Hiển thị điểm cao nhất đã đạt được
-        max_score = max([s["score"] for s in user_submissions])
+        max_score = summary["best_score"] or 0
         max_possible = sum([q["score"] for q in questions])
         
         st.write(f"**Điểm cao nhất đã đạt được:** {max_score}/{max_possible} ({(max_score/max_possible*100):.1f}%)")
@@ -48,26 +52,24 @@ def survey_form(email, full_name, class_name):
     
     # Kiểm tra nếu đã đạt đến giới hạn làm bài
     if remaining_attempts <= 0:
-        st.error("⚠️ Bạn đã sử dụng hết số lần làm bài cho phép (tối đa 3 lần).")
+        st.error(f"⚠️ Bạn đã sử dụng hết số lần làm bài cho phép (tối đa {MAX_ATTEMPTS} lần).")
         
-        # Hiển thị các lần làm bài trước đó
+        # Hiển thị các lần làm bài trước đó (chỉ tải bài làm khi mở lịch sử)
         if st.checkbox("Xem lịch sử các lần làm bài"):
             st.subheader("Lịch sử làm bài")
             
-            for idx, s in enumerate(user_submissions):
+            for idx, s in enumerate(get_user_submissions(email)):
                 submission_time = datetime.fromtimestamp(s["timestamp"]).strftime("%H:%M:%S %d/%m/%Y")
                 with st.expander(f"Lần {idx + 1}: Ngày {submission_time} - Điểm: {s['score']}/{max_score}"):
                     # Hiển thị chi tiết câu trả lời
-                    for q in questions:
-                        q_id = str(q["id"])
+                    for r in grader.submission_results(s):
+                        q = r.question
                         st.write(f"**Câu {q['id']}: {q['question']}**")
                         
-                        # Đáp án người dùng
-                        user_ans = s["responses"].get(q_id, [])
-                        expected = [q["answers"][i - 1] for i in q["correct"]]
-                        
-                        # Kiểm tra đúng/sai
-                        is_correct = set(user_ans) == set(expected)
+                        # Đáp án người dùng và kết quả đúng/sai
+                        user_ans = r.user_answers
+                        expected = r.expected
+                        is_correct = r.is_correct
                         
                         # Hiển thị đáp án của người dùng
                         st.write("Đáp án đã chọn:")
@@ -129,21 +131,19 @@ def survey_form(email, full_name, class_name):
             submit_button = st.form_submit_button(label="📨 Gửi đáp án", use_container_width=True)
             
             if submit_button:
-                # Kiểm tra lại số lần làm bài (để đảm bảo không vượt quá giới hạn)
-                latest_submissions = get_user_submissions(email)
-                if len(latest_submissions) >= MAX_ATTEMPTS:
+                # Lưu câu trả lời; giới hạn số lần làm bài được kiểm tra cùng lúc với việc lưu
+                # (hai lần gửi đồng thời không thể cùng vượt giới hạn)
+                result = save_submission(email, responses, max_attempts=MAX_ATTEMPTS)
+                
+                if result:
+                    st.session_state.submission_result = result
+                    st.session_state.max_score = max_score
+                    st.rerun()  # Làm mới trang để hiển thị kết quả
+                elif (get_submission_summary(email) or {"count": 0})["count"] >= MAX_ATTEMPTS:
                     st.error("Bạn đã sử dụng hết số lần làm bài cho phép!")
                     st.session_state.submission_result = None
                 else:
-                    # Lưu câu trả lời vào database với ID duy nhất
-                    result = save_submission(email, responses)
-                    
-                    if result:
-                        st.session_state.submission_result = result
-                        st.session_state.max_score = max_score
-                        st.rerun()  # Làm mới trang để hiển thị kết quả
-                    else:
-                        st.error("❌ Có lỗi xảy ra khi gửi đáp án, vui lòng thử lại!")
+                    st.error("❌ Có lỗi xảy ra khi gửi đáp án, vui lòng thử lại!")
     
     # Hiển thị kết quả sau khi nộp bài
     else:
@@ -167,10 +167,8 @@ def survey_form(email, full_name, class_name):
             </div>
             """, unsafe_allow_html=True)
         
-        # Cập nhật lại số lần làm bài sau khi nộp thành công
-        updated_submissions = get_user_submissions(email)
-        updated_count = len(updated_submissions)
-        remaining = MAX_ATTEMPTS - updated_count
+        # Số lần làm bài sau khi nộp (trang đã tải lại số liệu tổng hợp sau khi lưu)
+        remaining = MAX_ATTEMPTS - submission_count
         
         # Nút làm bài lại (nếu còn lượt)
         if remaining > 0:
@@ -0,0 +1,59 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+# Số dòng chuyển sang giá trị Python mỗi lần ghi
+ROW_CHUNK_SIZE = 1000
+
+# Hàng tiêu đề giống pd.DataFrame.to_excel: in đậm, căn giữa, viền mảnh
+_HEADER_FONT = Font(bold=True)
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+_HEADER_BORDER = Border(*(Side(style="thin") for _ in range(4)))
+
+
+def _header_row(sheet, columns):
+    cells = []
+    for col_name in columns:
+        cell = WriteOnlyCell(sheet, value=str(col_name))
+        cell.font = _HEADER_FONT
+        cell.alignment = _HEADER_ALIGNMENT
+        cell.border = _HEADER_BORDER
+        cells.append(cell)
+    return cells
+
+
+def iter_sheet_rows(df, chunk_size=ROW_CHUNK_SIZE, formatter=None):
+    """Các hàng dữ liệu của DataFrame dạng tuple giá trị Python (NaN thành ô trống)
+
+    formatter(khối dòng) trả về bản hiển thị của khối trước khi ghi.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        if formatter:
+            chunk = formatter(chunk)
+        chunk = chunk.astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def write_dataframes_xlsx(dataframes, sheet_names, target, progress=None, formatter=None):
+    """Ghi nhiều DataFrame thành các sheet của một file XLSX (đường dẫn hoặc file nhị phân đang mở).
+
+    Dùng workbook write-only của openpyxl: các hàng được ghi tuần tự ra file tạm
+    của từng sheet thay vì giữ toàn bộ ô trong bộ nhớ. progress(số dòng đã ghi,
+    tổng số dòng của mọi sheet) được gọi sau mỗi khối dòng; formatter như iter_sheet_rows.
+    """
+    total = sum(len(df) for df in dataframes)
+    written = 0
+    workbook = Workbook(write_only=True)
+    for df, sheet_name in zip(dataframes, sheet_names):
+        sheet = workbook.create_sheet(title=sheet_name)
+        sheet.append(_header_row(sheet, df.columns))
+        for i, row in enumerate(iter_sheet_rows(df, formatter=formatter), 1):
+            sheet.append(row)
+            if progress and i % ROW_CHUNK_SIZE == 0:
+                progress(written + i, total)
+        written += len(df)
+        if progress:
+            progress(written, total)
+    workbook.save(target)
@@ -0,0 +1,143 @@
+"""Tạo báo cáo khảo sát từ dòng lệnh, không cần chạy giao diện Streamlit.
+
+Ví dụ (cron hằng đêm):
+    python report_cli.py --output reports/ --class 10A1 --from 2024-09-01 --to 2025-01-15
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from database_helper import get_grader, get_all_users, load_submissions_frame, REPORT_SUBMISSION_COLUMNS
+from modules.report_data import (
+    ReportDataset, build_submissions_frame, build_question_stats, build_question_stats_frame,
+    build_student_rows, build_students_list_frame, build_class_stats_frame, REPORT_WORKERS
+)
+from modules.report_export import (
+    dataframe_to_docx, export_to_excel, export_to_csv, student_report_tasks, write_student_reports_zip,
+    safe_filename, BEST_SUBMISSION, LATEST_SUBMISSION
+)
+
+# Các báo cáo dạng bảng: (tên, tiêu đề, tên file không có phần mở rộng)
+TABLE_REPORTS = [
+    ("submissions", "Báo cáo tất cả bài nộp", "bao_cao_tat_ca_bai_nop"),
+    ("questions", "Báo cáo thống kê câu hỏi", "bao_cao_thong_ke_cau_hoi"),
+    ("students", "Báo cáo danh sách học viên", "bao_cao_danh_sach_hoc_vien"),
+    ("classes", "Báo cáo thống kê theo lớp", "bao_cao_thong_ke_lop"),
+]
+SHEET_NAMES = ["Tất cả bài nộp", "Thống kê câu hỏi", "Danh sách học viên", "Thống kê lớp"]
+ALL_REPORTS = [name for name, _, _ in TABLE_REPORTS] + ["excel", "student-reports"]
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Ngày không hợp lệ (cần YYYY-MM-DD): {value}")
+
+
+def load_dataset(class_name=None, start=None, end=None):
+    """Dựng ReportDataset từ database với bộ lọc lớp và khoảng thời gian [start, end)"""
+    grader = get_grader()
+    submissions = load_submissions_frame(class_name=class_name, start=start, end=end,
+                                         columns=REPORT_SUBMISSION_COLUMNS)
+    students = get_all_users(role="Học viên")
+    if class_name:
+        students = [s for s in students if s["class"] == class_name]
+    return ReportDataset(grader, submissions, students)
+
+
+def build_frames(dataset):
+    """Bốn bảng báo cáo, số liệu tính trực tiếp từ bộ dữ liệu đã lọc"""
+    question_stats = build_question_stats(dataset.questions, dataset.matrix.question_counts())
+    student_data = build_student_rows(dataset, dataset.submission_counts(), dataset.best_scores())
+    return [
+        build_submissions_frame(dataset),
+        build_question_stats_frame(question_stats),
+        build_students_list_frame(student_data),
+        build_class_stats_frame(pd.DataFrame(student_data)),
+    ]
+
+
+def print_progress(label):
+    def progress(done, total):
+        print(f"\r  {label}: {done}/{total}", end="", flush=True)
+        if done >= total:
+            print()
+    return progress
+
+
+def generate_reports(output_dir, reports, table_format="docx", class_name=None, start=None, end=None,
+                     mode=BEST_SUBMISSION, workers=None):
+    """Tạo các báo cáo đã chọn vào output_dir, trả về danh sách file đã ghi"""
+    started = time.perf_counter()
+    dataset = load_dataset(class_name, start, end)
+    print(f"Đã tải {len(dataset.submissions)} bài nộp, {len(dataset.students)} học viên, "
+          f"{len(dataset.questions)} câu hỏi ({time.perf_counter() - started:.2f}s)")
+    if not dataset.questions:
+        print("Chưa có dữ liệu câu hỏi nào trong hệ thống.")
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    frames = None
+    if any(name in reports for name in [name for name, _, _ in TABLE_REPORTS] + ["excel"]):
+        frames = build_frames(dataset)
+
+    for (name, title, filename), df in zip(TABLE_REPORTS, frames or []):
+        if name not in reports:
+            continue
+        path = os.path.join(output_dir, f"{filename}.{table_format}")
+        if table_format == "csv":
+            export_to_csv(df, path)
+        else:
+            dataframe_to_docx(df, title, path, progress=print_progress(filename))
+        written.append(path)
+
+    if "excel" in reports:
+        path = os.path.join(output_dir, "bao_cao_tong_hop.xlsx")
+        export_to_excel(frames, SHEET_NAMES, path, progress=print_progress("bao_cao_tong_hop"))
+        written.append(path)
+
+    if "student-reports" in reports:
+        tasks = student_report_tasks(dataset, class_name, mode)
+        path = os.path.join(output_dir, f"bao_cao_hoc_vien_{safe_filename(class_name or 'Tất cả')}_{mode}.zip")
+        if tasks:
+            write_student_reports_zip(tasks, path, workers=workers or REPORT_WORKERS,
+                                      progress=print_progress("bao_cao_hoc_vien"))
+            written.append(path)
+        else:
+            print("Không có bài nộp nào để tạo báo cáo từng học viên")
+
+    print(f"Hoàn thành sau {time.perf_counter() - started:.2f}s")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", required=True, help="Thư mục ghi báo cáo")
+    parser.add_argument("--class", dest="class_name", help="Chỉ lấy học viên và bài nộp của lớp này")
+    parser.add_argument("--from", dest="start", type=parse_date, help="Bài nộp từ ngày (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=parse_date, help="Bài nộp đến hết ngày (YYYY-MM-DD)")
+    parser.add_argument("--reports", nargs="+", choices=ALL_REPORTS, default=ALL_REPORTS,
+                        help="Các báo cáo cần tạo (mặc định: tất cả)")
+    parser.add_argument("--format", dest="table_format", choices=["docx", "csv"], default="docx",
+                        help="Định dạng các báo cáo dạng bảng")
+    parser.add_argument("--mode", choices=[BEST_SUBMISSION, LATEST_SUBMISSION], default=BEST_SUBMISSION,
+                        help="Bài nộp dùng cho báo cáo từng học viên")
+    parser.add_argument("--workers", type=int, help="Số tiến trình tạo báo cáo từng học viên")
+    args = parser.parse_args(argv)
+
+    end = args.end + timedelta(days=1) if args.end else None
+    written = generate_reports(args.output, args.reports, args.table_format, args.class_name, args.start, end,
+                               args.mode, args.workers)
+    for path in written:
+        print(f"  {path}")
+    return 0 if written else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
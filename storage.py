@@ -0,0 +1,711 @@
+import os
+import json
+import sqlite3
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import httpx
+
+# Các cột hợp lệ của từng bảng (dùng để kiểm tra tên cột trước khi ghép vào câu SQL)
+TABLE_COLUMNS = {
+    "users": ("id", "email", "password", "role", "first_login", "full_name", "class", "registration_date"),
+    "questions": ("id", "question", "type", "answers", "correct", "score"),
+    "submissions": ("id", "user_email", "timestamp", "responses", "score", "results", "grader_version",
+                    "options_version"),
+    "option_layouts": ("version", "answers"),
+}
+
+# Lược đồ SQLite, giữ tương thích với database cũ mà migrate_to_supabase.py đọc
+# (timestamp của submissions lưu dạng epoch)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    first_login INTEGER DEFAULT 1,
+    full_name TEXT DEFAULT '',
+    class TEXT DEFAULT '',
+    registration_date TEXT
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL,
+    type TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    correct TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    responses TEXT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    results TEXT,
+    grader_version TEXT,
+    options_version TEXT
+);
+CREATE TABLE IF NOT EXISTS option_layouts (
+    version TEXT PRIMARY KEY,
+    answers TEXT NOT NULL
+);
+"""
+
+def projection(table, columns, required=()):
+    """Kiểm tra danh sách cột cần lấy, luôn kèm các cột bắt buộc; None nghĩa là lấy tất cả"""
+    if not columns:
+        return None
+    selected = list(required)
+    for column in columns:
+        if column not in TABLE_COLUMNS[table]:
+            raise ValueError(f"Cột không hợp lệ cho bảng {table}: {column}")
+        if column not in selected:
+            selected.append(column)
+    return selected
+
+SQLITE_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
+CREATE INDEX IF NOT EXISTS idx_submissions_user_email ON submissions(user_email, timestamp);
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp ON submissions(timestamp, id);
+"""
+
+
+class RequestGate:
+    """Giới hạn số truy vấn đang chạy đồng thời tới server và đếm số liệu hàng đợi.
+
+    immediate: lấy được lượt ngay; waits: phải xếp hàng chờ lượt; timeouts: hết giờ
+    khi chờ lượt hoặc khi chờ server trả lời. Các số liệu này đếm lượt truy vấn,
+    không cho biết kết nối HTTP nào được dùng lại (việc đó do pool của httpx quản lý).
+    """
+
+    def __init__(self, max_in_flight, queue_timeout=None):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "immediate": 0, "waits": 0, "timeouts": 0, "errors": 0,
+            "in_flight": 0, "peak_in_flight": 0, "wait_seconds": 0.0,
+        }
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._stats["in_flight"])
+
+    @contextmanager
+    def slot(self):
+        """Giữ một lượt truy vấn trong suốt khối with"""
+        self._count(requests=1)
+        if self._semaphore.acquire(blocking=False):
+            self._count(immediate=1)
+        else:
+            started = time.perf_counter()
+            acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+            self._count(waits=1, wait_seconds=time.perf_counter() - started)
+            if not acquired:
+                self._count(timeouts=1)
+                raise TimeoutError(f"Quá {self.queue_timeout}s chờ lượt truy vấn (tối đa {self.max_in_flight} truy vấn đồng thời)")
+        self._count(in_flight=1)
+        try:
+            yield
+        except httpx.TimeoutException:
+            self._count(timeouts=1)
+            raise
+        except Exception:
+            self._count(errors=1)
+            raise
+        finally:
+            self._count(in_flight=-1)
+            self._semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, max_in_flight=self.max_in_flight)
+
+
+class StorageBackend:
+    """Giao diện chung cho các engine lưu trữ.
+
+    Mọi phương thức trả về các dòng dạng dict giống hệt dữ liệu Supabase trả về
+    (answers/correct/responses có thể là chuỗi JSON, timestamp là chuỗi ISO),
+    nên database_helper giải mã dữ liệu như nhau với mọi engine.
+    Lỗi được ném ra ngoài để database_helper tự xử lý.
+    """
+
+    name = "base"
+
+    def ensure_schema(self):
+        """Kiểm tra (hoặc tạo) các bảng cần thiết"""
+        raise NotImplementedError
+
+    def count_users(self):
+        """Đếm số người dùng"""
+        raise NotImplementedError
+
+    def find_users(self, role=None, email=None, password=None, class_name=None, columns=None, limit=None):
+        """Lấy danh sách người dùng theo các điều kiện bằng, có thể chỉ lấy một số cột"""
+        raise NotImplementedError
+
+    def insert_user(self, data):
+        raise NotImplementedError
+
+    def upsert_user(self, data):
+        raise NotImplementedError
+
+    def update_user(self, email, data):
+        raise NotImplementedError
+
+    def find_questions(self, question_id=None):
+        raise NotImplementedError
+
+    def insert_question(self, data):
+        raise NotImplementedError
+
+    def update_question(self, question_id, data):
+        raise NotImplementedError
+
+    def delete_question(self, question_id):
+        raise NotImplementedError
+
+    def insert_submission(self, data, max_attempts=None):
+        """Thêm một bài nộp; với max_attempts, kiểm tra số bài đã nộp và thêm trong cùng một giao dịch
+
+        Trả về danh sách rỗng (không thêm) nếu học viên đã nộp đủ max_attempts bài.
+        """
+        raise NotImplementedError
+
+    def update_submission(self, submission_id, data):
+        raise NotImplementedError
+
+    def update_submission_responses(self, updates):
+        """Ghi lại responses và options_version của nhiều bài nộp trong một lượt
+
+        updates là danh sách dict id, responses (JSON), options_version. Trả về số bài đã cập nhật.
+        """
+        raise NotImplementedError
+
+    def stamp_options_version(self, version):
+        """Gán options_version cho các bài nộp chưa có (lưu trước khi có cột này) bằng một câu lệnh"""
+        raise NotImplementedError
+
+    def insert_option_layout(self, version, answers):
+        """Lưu danh sách đáp án (JSON, ID câu hỏi -> đáp án) của một phiên bản, bỏ qua nếu đã có"""
+        raise NotImplementedError
+
+    def find_option_layout(self, version):
+        """Danh sách đáp án (JSON) đã lưu của một phiên bản, None nếu không có"""
+        raise NotImplementedError
+
+    def find_submissions(self, user_email=None):
+        """Lấy các lần nộp bài, mới nhất trước"""
+        raise NotImplementedError
+
+    def submission_summary(self, user_email):
+        """Số bài nộp (count), điểm cao nhất (best_score) và thời gian nộp gần nhất (last_timestamp, ISO)
+        của một học viên, tính bằng một truy vấn gộp; best_score/last_timestamp là None nếu chưa nộp"""
+        raise NotImplementedError
+
+    def find_submissions_page(self, after=None, limit=1000, user_emails=None, class_name=None, start=None, end=None,
+                              columns=None):
+        """Lấy một trang bài nộp theo thứ tự (timestamp, id) tăng dần, nằm sau con trỏ after.
+
+        class_name lọc theo lớp của học viên ngay trong database. start/end là datetime
+        (nửa khoảng [start, end)). Trả về (rows, cursor) với cursor là con trỏ của dòng
+        cuối cùng, dùng cho trang kế tiếp; trang rỗng nghĩa là đã hết dữ liệu.
+        """
+        raise NotImplementedError
+
+    def latest_submission_cursor(self):
+        """Con trỏ (timestamp, id) của bài nộp mới nhất, None nếu chưa có bài nộp"""
+        raise NotImplementedError
+
+    def missing_submission_columns(self):
+        """Các cột thêm sau của bảng submissions chưa có trong database (database cũ chưa nâng cấp)"""
+        return set()
+
+
+# Các cột thêm sau vào bảng submissions (xem README), bảng Supabase cũ có thể chưa có
+OPTIONAL_SUBMISSION_COLUMNS = ("results", "grader_version", "options_version")
+
+
+def _missing_column(error):
+    """Lỗi khi đọc (42703) hoặc ghi (PGRST204) một cột không có trong bảng"""
+    code = getattr(error, "code", None)
+    return code in ("42703", "PGRST204") or "42703" in str(error) or "PGRST204" in str(error)
+
+
+def _missing_function(error):
+    """Lỗi PostgREST khi hàm SQL được gọi chưa được tạo trong database (mã PGRST202)"""
+    return getattr(error, "code", None) == "PGRST202" or "PGRST202" in str(error)
+
+
+class SupabaseBackend(StorageBackend):
+    """Engine lưu trữ dùng Supabase (PostgREST)"""
+
+    name = "supabase"
+
+    def __init__(self, client, gate=None):
+        self.client = client
+        self.gate = gate
+        # Các hàm SQL (xem README) chưa được tạo: dùng truy vấn thường thay thế
+        self._missing_functions = set()
+        # Các cột tùy chọn chưa có trong bảng submissions (None: chưa kiểm tra)
+        self._missing_columns = None
+
+    def _execute(self, query):
+        if self.gate is None:
+            return query.execute()
+        with self.gate.slot():
+            return query.execute()
+
+    def _rpc(self, name, params, fallback):
+        """Gọi hàm SQL name; nếu hàm chưa được tạo trên Supabase thì dùng fallback()"""
+        if name not in self._missing_functions:
+            try:
+                return self._execute(self.client.rpc(name, params)).data
+            except Exception as e:
+                if not _missing_function(e):
+                    raise
+                self._missing_functions.add(name)
+                print(f"Supabase function {name} not found, falling back to plain queries (see README)")
+        return fallback()
+
+    def missing_submission_columns(self):
+        # Kiểm tra một lần cho mỗi tiến trình, mỗi cột một truy vấn một dòng
+        if self._missing_columns is None:
+            missing = set()
+            for column in OPTIONAL_SUBMISSION_COLUMNS:
+                try:
+                    self._execute(self.client.table('submissions').select(column).limit(1))
+                except Exception as e:
+                    if not _missing_column(e):
+                        raise
+                    missing.add(column)
+            if missing:
+                print(f"Submissions table has no column {', '.join(sorted(missing))}: "
+                      f"per-question results are not stored, add them with the ALTER TABLE in README")
+            self._missing_columns = missing
+        return self._missing_columns
+
+    def _existing_columns(self, data):
+        """Bỏ các cột bảng submissions chưa có khỏi dữ liệu cần ghi"""
+        missing = self.missing_submission_columns()
+        return {k: v for k, v in data.items() if k not in missing} if missing else data
+
+    def _count_submissions(self, user_email):
+        query = self.client.table('submissions').select('id', count='exact').eq('user_email', user_email).limit(1)
+        return self._execute(query).count or 0
+
+    def ensure_schema(self):
+        # PostgreSQL không hỗ trợ tạo bảng qua API, chỉ kiểm tra bảng users
+        self._execute(self.client.table('users').select('count', count='exact').limit(1))
+
+    def count_users(self):
+        resp = self._execute(self.client.table('users').select('count', count='exact'))
+        return resp.count if hasattr(resp, 'count') else 0
+
+    def find_users(self, role=None, email=None, password=None, class_name=None, columns=None, limit=None):
+        selected = projection("users", columns)
+        query = self.client.table('users').select(",".join(selected) if selected else '*')
+        if role:
+            query = query.eq('role', role)
+        if class_name is not None:
+            query = query.eq('class', class_name)
+        if email is not None:
+            query = query.eq('email', email)
+        if password is not None:
+            query = query.eq('password', password)
+        if limit:
+            query = query.limit(limit)
+        return self._execute(query).data
+
+    def insert_user(self, data):
+        return self._execute(self.client.table('users').insert(data)).data
+
+    def upsert_user(self, data):
+        return self._execute(self.client.table('users').upsert(data)).data
+
+    def update_user(self, email, data):
+        return self._execute(self.client.table('users').update(data).eq('email', email)).data
+
+    def find_questions(self, question_id=None):
+        query = self.client.table('questions').select('*')
+        if question_id is not None:
+            query = query.eq('id', question_id)
+        return self._execute(query.order('id')).data
+
+    def insert_question(self, data):
+        return self._execute(self.client.table('questions').insert(data)).data
+
+    def update_question(self, question_id, data):
+        return self._execute(self.client.table('questions').update(data).eq('id', question_id)).data
+
+    def delete_question(self, question_id):
+        return self._execute(self.client.table('questions').delete().eq('id', question_id)).data
+
+    def insert_submission(self, data, max_attempts=None):
+        data = self._existing_columns(data)
+        if max_attempts is None:
+            return self._execute(self.client.table('submissions').insert(data)).data
+        # Hàm SQL insert_submission_limited (xem README) khóa theo email rồi mới đếm và thêm
+        params = {"submission": data, "max_attempts": max_attempts}
+        return self._rpc('insert_submission_limited', params, lambda: self._insert_submission_unlocked(data, max_attempts))
+
+    def _insert_submission_unlocked(self, data, max_attempts):
+        """Đếm rồi thêm bằng hai truy vấn riêng: các lần nộp đồng thời vẫn có thể cùng vượt giới hạn"""
+        if self._count_submissions(data["user_email"]) >= max_attempts:
+            return []
+        return self._execute(self.client.table('submissions').insert(data)).data
+
+    def update_submission(self, submission_id, data):
+        data = self._existing_columns(data)
+        if not data:
+            return []
+        return self._execute(self.client.table('submissions').update(data).eq('id', submission_id)).data
+
+    def update_submission_responses(self, updates):
+        if not updates:
+            return 0
+        # Hàm SQL update_submission_responses (xem README) cập nhật cả lô trong một truy vấn
+        return self._rpc('update_submission_responses', {"updates": updates},
+                         lambda: sum(bool(self.update_submission(u["id"], {k: v for k, v in u.items() if k != "id"}))
+                                     for u in updates))
+
+    def stamp_options_version(self, version):
+        if "options_version" in self.missing_submission_columns():
+            return
+        self._execute(self.client.table('submissions').update({"options_version": version})
+                      .is_('options_version', 'null'))
+
+    def insert_option_layout(self, version, answers):
+        query = self.client.table('option_layouts').upsert({"version": version, "answers": answers},
+                                                             on_conflict='version', ignore_duplicates=True)
+        self._execute(query)
+
+    def find_option_layout(self, version):
+        rows = self._execute(self.client.table('option_layouts').select('answers').eq('version', version)).data
+        return rows[0]["answers"] if rows else None
+
+    def find_submissions(self, user_email=None):
+        query = self.client.table('submissions').select('*')
+        if user_email:
+            query = query.eq('user_email', user_email)
+        return self._execute(query.order('timestamp', desc=True)).data
+
+    def submission_summary(self, user_email):
+        rows = self._rpc('submission_summary', {"p_user_email": user_email},
+                         lambda: [self._submission_summary_queries(user_email)])
+        return rows[0] if rows else {"count": 0, "best_score": None, "last_timestamp": None}
+
+    def _submission_summary_queries(self, user_email):
+        """Như hàm SQL submission_summary, bằng hai truy vấn một dòng (số bài đếm kèm truy vấn đầu)"""
+        best = self._execute(self.client.table('submissions').select('score', count='exact')
+                             .eq('user_email', user_email).order('score', desc=True, nullsfirst=False).limit(1))
+        last = self._execute(self.client.table('submissions').select('timestamp')
+                             .eq('user_email', user_email).order('timestamp', desc=True).limit(1)).data
+        return {
+            "count": best.count or 0,
+            "best_score": best.data[0]["score"] if best.data else None,
+            "last_timestamp": last[0]["timestamp"] if last else None,
+        }
+
+    def find_submissions_page(self, after=None, limit=1000, user_emails=None, class_name=None, start=None, end=None,
+                              columns=None):
+        selected = projection("submissions", columns, required=("id", "timestamp"))
+        if selected:
+            selected = [c for c in selected if c not in self.missing_submission_columns()]
+        fields = ",".join(selected) if selected else '*'
+        if class_name is not None and "class_submissions" not in self._missing_functions:
+            # Hàm SQL trả về bài nộp của lớp (xem README): URL không phải mang danh sách email của cả lớp
+            try:
+                query = self.client.rpc('class_submissions', {'p_class': class_name}).select(fields)
+                return self._submissions_page(query, after, limit, user_emails, start, end)
+            except Exception as e:
+                if not _missing_function(e):
+                    raise
+                self._missing_functions.add("class_submissions")
+                print("Supabase function class_submissions not found, filtering classes in the app (see README)")
+        if class_name is None:
+            return self._submissions_page(self.client.table('submissions').select(fields), after, limit, user_emails,
+                                          start, end)
+        # Chưa có hàm: đọc các trang không lọc lớp rồi lọc theo email, bỏ qua trang không có bài của lớp
+        class_emails = {u["email"] for u in self.find_users(class_name=class_name, columns=["email"])}
+        if user_emails is not None:
+            class_emails &= set(user_emails)
+        while True:
+            query = self.client.table('submissions').select(fields if fields == '*' else fields + ',user_email')
+            rows, after = self._submissions_page(query, after, limit, None, start, end)
+            if not rows:
+                return rows, after
+            rows = [r for r in rows if r["user_email"] in class_emails]
+            if rows:
+                if selected and "user_email" not in selected:
+                    rows = [{k: v for k, v in r.items() if k != "user_email"} for r in rows]
+                return rows, after
+
+    def _submissions_page(self, query, after, limit, user_emails, start, end):
+        if user_emails is not None:
+            query = query.in_('user_email', list(user_emails))
+        if start is not None:
+            query = query.gte('timestamp', start.isoformat())
+        if end is not None:
+            query = query.lt('timestamp', end.isoformat())
+        if after is not None:
+            # Keyset: (timestamp, id) > (ts, id), giá trị timestamp phải đặt trong ngoặc kép
+            ts, last_id = after
+            query = query.or_(f'timestamp.gt."{ts}",and(timestamp.eq."{ts}",id.gt.{int(last_id)})')
+        query = query.order('timestamp').order('id').limit(limit)
+        rows = self._execute(query).data
+        cursor = (rows[-1]["timestamp"], rows[-1]["id"]) if rows else after
+        return rows, cursor
+
+    def latest_submission_cursor(self):
+        query = self.client.table('submissions').select('id,timestamp')
+        rows = self._execute(query.order('timestamp', desc=True).order('id', desc=True).limit(1)).data
+        return (rows[0]["timestamp"], rows[0]["id"]) if rows else None
+
+
+class SQLiteBackend(StorageBackend):
+    """Engine lưu trữ cục bộ dùng SQLite, cho triển khai một máy chủ và benchmark offline"""
+
+    name = "sqlite"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        """Mỗi luồng dùng một kết nối riêng (Streamlit chạy mỗi phiên trên một luồng)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._schema_ready:
+            self._create_schema(conn)
+        return conn
+
+    def _create_schema(self, conn):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.executescript(SQLITE_SCHEMA)
+            # Database cũ có thể thiếu một số cột, bổ sung nếu cần
+            for table, columns in TABLE_COLUMNS.items():
+                existing = {row["name"] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+                for column in columns:
+                    if column not in existing and column != "id":
+                        conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+            conn.executescript(SQLITE_INDEXES)
+            conn.commit()
+            self._schema_ready = True
+
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def _where(self, conditions):
+        """Ghép điều kiện bằng (bỏ qua giá trị None) thành mệnh đề WHERE"""
+        clauses = []
+        params = []
+        for column, value in conditions:
+            if value is None:
+                continue
+            clauses.append(f'"{column}" = ?')
+            params.append(value)
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def _prepare(self, table, data):
+        """Chuẩn hóa dữ liệu ghi: kiểm tra tên cột và mã hóa list/dict thành JSON"""
+        values = {}
+        for column, value in data.items():
+            if column not in TABLE_COLUMNS[table]:
+                raise ValueError(f"Cột không hợp lệ cho bảng {table}: {column}")
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            elif table == "submissions" and column == "timestamp" and isinstance(value, str):
+                value = datetime.fromisoformat(value).timestamp()
+            values[column] = value
+        return values
+
+    def _insert(self, conn, table, data):
+        values = self._prepare(table, data)
+        columns = ", ".join(f'"{c}"' for c in values)
+        placeholders = ", ".join("?" for _ in values)
+        cursor = conn.execute(f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders})', list(values.values()))
+        return cursor.lastrowid
+
+    def _user_row(self, row):
+        if "first_login" in row:
+            row["first_login"] = bool(row["first_login"])
+        return row
+
+    def _submission_row(self, row):
+        row["timestamp"] = datetime.fromtimestamp(row["timestamp"]).isoformat()
+        return row
+
+    def ensure_schema(self):
+        self._connect()
+
+    def count_users(self):
+        return self._connect().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def find_users(self, role=None, email=None, password=None, class_name=None, columns=None, limit=None):
+        selected = projection("users", columns)
+        fields = ", ".join(f'"{c}"' for c in selected) if selected else "*"
+        where, params = self._where([("role", role or None), ("email", email), ("password", password),
+                                     ("class", class_name)])
+        if limit:
+            where += " LIMIT ?"
+            params.append(limit)
+        return [self._user_row(row) for row in self._query(f'SELECT {fields} FROM users{where}', params)]
+
+    def insert_user(self, data):
+        conn = self._connect()
+        with conn:
+            rowid = self._insert(conn, "users", data)
+        return [self._user_row(row) for row in self._query('SELECT * FROM users WHERE rowid = ?', (rowid,))]
+
+    def upsert_user(self, data):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM users WHERE email = ?', (data["email"],))
+            rowid = self._insert(conn, "users", data)
+        return [self._user_row(row) for row in self._query('SELECT * FROM users WHERE rowid = ?', (rowid,))]
+
+    def update_user(self, email, data):
+        values = self._prepare("users", data)
+        assignments = ", ".join(f'"{c}" = ?' for c in values)
+        conn = self._connect()
+        with conn:
+            conn.execute(f'UPDATE users SET {assignments} WHERE email = ?', list(values.values()) + [email])
+        return self.find_users(email=email)
+
+    def find_questions(self, question_id=None):
+        where, params = self._where([("id", question_id)])
+        return self._query(f'SELECT * FROM questions{where} ORDER BY id', params)
+
+    def insert_question(self, data):
+        conn = self._connect()
+        with conn:
+            rowid = self._insert(conn, "questions", data)
+        return self.find_questions(rowid)
+
+    def update_question(self, question_id, data):
+        values = self._prepare("questions", data)
+        assignments = ", ".join(f'"{c}" = ?' for c in values)
+        conn = self._connect()
+        with conn:
+            conn.execute(f'UPDATE questions SET {assignments} WHERE id = ?', list(values.values()) + [question_id])
+        return self.find_questions(question_id)
+
+    def delete_question(self, question_id):
+        rows = self.find_questions(question_id)
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM questions WHERE id = ?', (question_id,))
+        return rows
+
+    def insert_submission(self, data, max_attempts=None):
+        conn = self._connect()
+        with conn:
+            if max_attempts is not None:
+                # Giữ khóa ghi từ lúc đếm đến lúc thêm: hai lần nộp đồng thời không cùng vượt giới hạn
+                conn.execute("BEGIN IMMEDIATE")
+                count = conn.execute('SELECT COUNT(*) FROM submissions WHERE user_email = ?',
+                                     (data["user_email"],)).fetchone()[0]
+                if count >= max_attempts:
+                    return []
+            rowid = self._insert(conn, "submissions", data)
+        rows = self._query('SELECT * FROM submissions WHERE id = ?', (rowid,))
+        return [self._submission_row(row) for row in rows]
+
+    def update_submission(self, submission_id, data):
+        values = self._prepare("submissions", data)
+        assignments = ", ".join(f'"{c}" = ?' for c in values)
+        conn = self._connect()
+        with conn:
+            conn.execute(f'UPDATE submissions SET {assignments} WHERE id = ?', list(values.values()) + [submission_id])
+        rows = self._query('SELECT * FROM submissions WHERE id = ?', (submission_id,))
+        return [self._submission_row(row) for row in rows]
+
+    def update_submission_responses(self, updates):
+        conn = self._connect()
+        with conn:
+            conn.executemany('UPDATE submissions SET responses = ?, options_version = ? WHERE id = ?',
+                             [(u["responses"], u["options_version"], u["id"]) for u in updates])
+        return len(updates)
+
+    def stamp_options_version(self, version):
+        conn = self._connect()
+        with conn:
+            conn.execute('UPDATE submissions SET options_version = ? WHERE options_version IS NULL', (version,))
+
+    def insert_option_layout(self, version, answers):
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO option_layouts (version, answers) VALUES (?, ?)', (version, answers))
+
+    def find_option_layout(self, version):
+        rows = self._query('SELECT answers FROM option_layouts WHERE version = ?', (version,))
+        return rows[0]["answers"] if rows else None
+
+    def find_submissions(self, user_email=None):
+        where, params = self._where([("user_email", user_email or None)])
+        rows = self._query(f'SELECT * FROM submissions{where} ORDER BY timestamp DESC, id DESC', params)
+        return [self._submission_row(row) for row in rows]
+
+    def submission_summary(self, user_email):
+        row = self._query('SELECT COUNT(*) AS count, MAX(score) AS best_score, MAX(timestamp) AS last_timestamp '
+                          'FROM submissions WHERE user_email = ?', (user_email,))[0]
+        if row["last_timestamp"] is not None:
+            row["last_timestamp"] = datetime.fromtimestamp(row["last_timestamp"]).isoformat()
+        return row
+
+    def find_submissions_page(self, after=None, limit=1000, user_emails=None, class_name=None, start=None, end=None,
+                              columns=None):
+        selected = projection("submissions", columns, required=("id", "timestamp"))
+        fields = ", ".join(f'"{c}"' for c in selected) if selected else "*"
+        clauses = []
+        params = []
+        if user_emails is not None:
+            user_emails = list(user_emails)
+            if not user_emails:
+                return [], after
+            clauses.append(f'user_email IN ({", ".join("?" for _ in user_emails)})')
+            params.extend(user_emails)
+        if class_name is not None:
+            clauses.append("user_email IN (SELECT email FROM users WHERE class = ?)")
+            params.append(class_name)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start.timestamp())
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end.timestamp())
+        if after is not None:
+            clauses.append("(timestamp, id) > (?, ?)")
+            params.extend(after)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = self._query(f'SELECT {fields} FROM submissions{where} ORDER BY timestamp, id LIMIT ?', params + [limit])
+        # Con trỏ giữ nguyên giá trị epoch đã lưu để so sánh chính xác
+        cursor = (rows[-1]["timestamp"], rows[-1]["id"]) if rows else after
+        return [self._submission_row(row) for row in rows], cursor
+
+    def latest_submission_cursor(self):
+        rows = self._query('SELECT timestamp, id FROM submissions ORDER BY timestamp DESC, id DESC LIMIT 1')
+        return (rows[0]["timestamp"], rows[0]["id"]) if rows else None